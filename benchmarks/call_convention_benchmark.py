@@ -0,0 +1,77 @@
+"""
+Compares passing arguments by keyword, as every generated call used to, with passing them by position.
+
+PythonKit builds a kwargs dict for every call that has a keyword argument and then calls PyObject_Call, which is
+reproduced here through ctypes. The number of keyword arguments left at the call sites of the generated code is
+counted with all arguments passed by keyword (before) and with the current calling convention (after).
+
+    python -m benchmarks.call_convention_benchmark --arguments 3
+"""
+import argparse
+import ctypes
+import re
+import tempfile
+import timeit
+from pathlib import Path
+
+from benchmarks.corpus import synthetic_stub
+from swift_python_wrapper.core import create_module_orm, load_module_from_path
+
+KEYWORD_ARGUMENT = re.compile(r'(\w+): \1\.wrappedInstance')
+
+PyObject_Call = ctypes.pythonapi.PyObject_Call
+PyObject_Call.restype = ctypes.py_object
+PyObject_Call.argtypes = [ctypes.py_object, ctypes.py_object, ctypes.c_void_p]
+
+
+def keyword_arguments(module) -> int:
+    return len(KEYWORD_ARGUMENT.findall(module.render()))
+
+
+def all_by_keyword(module):
+    def function(f):
+        return f._replace(args=[x._replace(keyword=True) for x in f.args])
+    return module._replace(
+        functions=[function(x) for x in module.functions],
+        classes=[
+            x._replace(methods=[function(m) for m in x.methods], init_params=[[a._replace(keyword=True) for a in p] for p in x.init_params])
+            for x in module.classes
+        ],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--arguments', type=int, default=3)
+    parser.add_argument('--number', type=int, default=200000)
+    args = parser.parse_args()
+
+    names = [f'a{i}' for i in range(args.arguments)]
+    namespace = {}
+    exec(f'def f({", ".join(names)}): pass', namespace)
+    f = namespace['f']
+    values = tuple(range(args.arguments))
+
+    def keyword_call():
+        kwargs = dict(zip(names, values))
+        PyObject_Call(f, (), id(kwargs))
+
+    def positional_call():
+        PyObject_Call(f, values, None)
+
+    timings = {}
+    for name, call in [('keyword', keyword_call), ('positional', positional_call)]:
+        timings[name] = min(timeit.repeat(call, number=args.number, repeat=3)) / args.number
+        print(f'{name:>12}: {timings[name] * 1e9:.0f} ns per call with {args.arguments} arguments')
+    print(f'{"speedup":>12}: {timings["keyword"] / timings["positional"]:.2f}x')
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path = Path(work_dir) / 'synthetic.py'
+        path.write_text(synthetic_stub())
+        module = create_module_orm(load_module_from_path('synthetic', str(path)))
+        before, after = keyword_arguments(all_by_keyword(module)), keyword_arguments(module)
+    print(f'{"call sites":>12}: {before} keyword arguments before, {after} after')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Synthetic stub modules for the benchmarks, so the cost of each phase can be measured as the input grows.
+
+    python -m benchmarks.corpus --classes 100 --methods 10 --overloads 4 --union-width 3 > synthetic.py
+"""
+import argparse
+
+
+def synthetic_stub(classes: int = 50, methods: int = 10, overloads: int = 4, union_width: int = 3) -> str:
+    """
+    A stub with classes classes, each one with methods methods taking a Union of union_width types, an overloaded
+    method with overloads signatures (each also taking the Union) and an __add__ so magic methods get rendered.
+    """
+    union_members = [f'U{i}' for i in range(union_width)]
+    union = f'Union[{", ".join(union_members)}]' if union_width > 1 else union_members[0]
+    lines = ['from typing import overload, Union, List, Optional', '']
+    for name in union_members:
+        lines += ['', f'class {name}:', f'    value: int', '']
+    for c in range(classes):
+        lines += ['', f'class C{c}:', '    size: int', '    name: str', '']
+        for m in range(methods):
+            lines += [f'    def m{m}(self, x: {union}, y: int = 0) -> Optional[int]: ...']
+        for o in range(overloads):
+            lines += ['    @overload', f'    def o(self, x: {union_members[o % union_width]}, y: {union}) -> List[int]: ...']
+        lines += [f"    def __add__(self, other: 'C{c}') -> 'C{c}': ..."]
+    lines += ['']
+    for m in range(methods):
+        lines += [f'def f{m}(x: {union}, y: int = 0) -> int: ...']
+    for o in range(overloads):
+        lines += ['@overload', f'def g(x: {union_members[o % union_width]}, y: {union}) -> List[int]: ...']
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--classes', type=int, default=50)
+    parser.add_argument('--methods', type=int, default=10)
+    parser.add_argument('--overloads', type=int, default=4)
+    parser.add_argument('--union-width', type=int, default=3)
+    args = parser.parse_args()
+    print(synthetic_stub(args.classes, args.methods, args.overloads, args.union_width), end='')
+
+
+if __name__ == '__main__':
+    main()
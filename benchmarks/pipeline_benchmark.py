@@ -0,0 +1,123 @@
+"""
+Times each phase of the generator on stubs/builtins.stub.py and on synthetic stubs of growing size, and records
+the results as JSON so they can be compared across commits:
+
+    python -m benchmarks.pipeline_benchmark --scales 1 2 4 8 --output benchmark.json
+
+Phases: extract (create_module_orm on the imported module), parse_overloads, flatten (Union expansion of the
+parsed overloads), render (SwiftModule.render) and generate (render_module, from file to Swift file).
+For each synthetic phase the scaling exponent between the smallest and largest corpus is reported,
+1 is linear and anything clearly above it means the phase grows superlinearly with the number of classes.
+"""
+import argparse
+import json
+import math
+import platform
+import subprocess
+import tempfile
+import time
+import timeit
+import warnings
+from pathlib import Path
+from typing import Dict, List
+
+from benchmarks.corpus import synthetic_stub
+from swift_python_wrapper.core import create_module_orm, load_module_from_path, flatten_functions, render_module, \
+    UnionOverloadLimitWarning
+from swift_python_wrapper.module_index import build_module_index
+from swift_python_wrapper.overload_parser import parse_module_overloads
+
+BUILTINS_STUB = Path(__file__).parent.parent / 'stubs' / 'builtins.stub.py'
+
+
+def clear_caches():
+    build_module_index.cache_clear()
+    parse_module_overloads.cache_clear()
+
+
+def time_phase(f, repeat: int) -> float:
+    def run():
+        clear_caches()
+        f()
+    return min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+def benchmark_module(module_name: str, module_path: Path, target_dir: str, repeat: int) -> Dict[str, float]:
+    source = module_path.read_text()
+    module = load_module_from_path(module_name, str(module_path))
+    overloads = [f for functions in parse_module_overloads(source, module_name).values() for f in functions]
+    orm = create_module_orm(module)
+    return {
+        'extract': time_phase(lambda: create_module_orm(module), repeat),
+        'parse_overloads': time_phase(lambda: parse_module_overloads(source, module_name), repeat),
+        'flatten': time_phase(lambda: flatten_functions(overloads), repeat),
+        'render': time_phase(orm.render, repeat),
+        'generate': time_phase(lambda: render_module(module_name, str(module_path), target_dir), repeat),
+    }
+
+
+def scaling_exponents(sizes: List[int], timings: List[Dict[str, float]]) -> Dict[str, float]:
+    if len(sizes) < 2 or sizes[0] == sizes[-1]:
+        return {}
+    return {
+        phase: math.log(timings[-1][phase] / timings[0][phase]) / math.log(sizes[-1] / sizes[0])
+        for phase in timings[0]
+        if timings[0][phase] > 0
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=str(Path(__file__).parent), stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--classes', type=int, default=25, help='Classes of the smallest synthetic corpus')
+    parser.add_argument('--methods', type=int, default=10)
+    parser.add_argument('--overloads', type=int, default=4)
+    parser.add_argument('--union-width', type=int, default=3)
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 4], help='Synthetic corpus sizes, in multiples of --classes')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='JSON file to write the results to, printed if not given')
+    args = parser.parse_args()
+    warnings.simplefilter('ignore', UnionOverloadLimitWarning)
+
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'parameters': vars(args),
+        'corpora': [],
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        results['corpora'].append({
+            'name': 'builtins.stub',
+            'classes': None,
+            'timings': benchmark_module('builtins_stub', BUILTINS_STUB, work_dir, args.repeat),
+        })
+        sizes, timings = [], []
+        for scale in args.scales:
+            classes = args.classes * scale
+            module_name = f'synthetic_{classes}'
+            module_path = Path(work_dir) / f'{module_name}.py'
+            module_path.write_text(synthetic_stub(classes, args.methods, args.overloads, args.union_width))
+            sizes.append(classes)
+            timings.append(benchmark_module(module_name, module_path, work_dir, args.repeat))
+            results['corpora'].append({'name': module_name, 'classes': classes, 'timings': timings[-1]})
+        results['scaling_exponents'] = scaling_exponents(sizes, timings)
+
+    for corpus in results['corpora']:
+        print(f'{corpus["name"]:>16}: ' + ', '.join(f'{k} {v * 1000:.1f} ms' for k, v in corpus['timings'].items()))
+    print(f'{"scaling":>16}: ' + ', '.join(f'{k} {v:.2f}' for k, v in results['scaling_exponents'].items()))
+    report = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
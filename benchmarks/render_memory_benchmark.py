@@ -0,0 +1,45 @@
+"""
+Compares the peak memory of rendering a module to a string with streaming it to its file.
+The classes of the module are repeated to simulate a very large stub.
+
+    python -m benchmarks.render_memory_benchmark --module-path stubs/builtins.stub.py --copies 20
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from swift_python_wrapper.core import write_module
+from swift_python_wrapper.static_extraction import create_static_module_orm
+
+
+def measure(f):
+    tracemalloc.start()
+    start = time.perf_counter()
+    f()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--module-path', default=str(Path(__file__).parent.parent / 'stubs' / 'builtins.stub.py'))
+    parser.add_argument('--copies', type=int, default=20)
+    args = parser.parse_args()
+    module = create_static_module_orm(Path(args.module_path).stem, args.module_path)
+    module = module._replace(classes=module.classes * args.copies)
+    module.render()  # Compile the templates outside of the measurements
+
+    with tempfile.TemporaryDirectory() as target_dir:
+        path = Path(target_dir) / f'{module.swift_module_name}.swift'
+        for name, f in [('string', lambda: path.write_text(module.render())), ('stream', lambda: write_module(module, target_dir))]:
+            elapsed, peak = measure(f)
+            print(f'{name:>10}: {elapsed * 1000:.1f} ms, peak memory {peak / 2 ** 20:.1f} MiB '
+                  f'({len(module.classes)} classes, {path.stat().st_size / 2 ** 20:.1f} MiB of Swift)')
+
+
+if __name__ == '__main__':
+    main()
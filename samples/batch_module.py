@@ -0,0 +1,15 @@
+from typing import Optional
+
+
+# SWIFT_WRAPPER.scale: Batch
+def scale(x: float, factor: float) -> float:
+    return x * factor
+
+
+# SWIFT_WRAPPER.parse: Batch
+def parse(s: str) -> Optional[int]:
+    return int(s) if s.isdigit() else None
+
+
+def single(s: str) -> int:
+    return 1
@@ -1,9 +1,37 @@
+import cProfile
+import json
+import time
 from pathlib import Path
 from shutil import copy
 
 import click
 
-from swift_python_wrapper.core import build_swift_wrappers_module
+from swift_python_wrapper.core import build_swift_wrappers_module, set_max_union_overloads, MAX_UNION_OVERLOADS
+from swift_python_wrapper.ir import build_ir, render_ir
+from swift_python_wrapper.layout import set_output_layout
+from swift_python_wrapper.profiling import start_profiling, stop_profiling
+from swift_python_wrapper.rendering import set_bytecode_cache_dir, set_instrumentation
+from swift_python_wrapper.type_mapping import set_numeric_list_mappings
+from swift_python_wrapper.watch import Watcher, serve_in_background
+
+
+def copy_builtins_stub(module_path: str):
+    if not (Path(module_path) / 'builtins.stub.py').exists():
+        copy(Path(__file__).parent.parent / 'stubs/builtins.stub.py', module_path)
+
+
+def output_layout_options(command):
+    command = click.option('--swift-package', default=None,
+                           help='Write a Swift package with this library name, one target per module, instead of loose files')(command)
+    return click.option('--shard-size', default=None, type=click.IntRange(min=1),
+                        help='Split each module into files of about this many bytes, which Swift compiles in parallel')(command)
+
+
+def apply_output_layout(shard_size, swift_package):
+    try:
+        set_output_layout(shard_size=shard_size, swift_package=swift_package)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--swift-package')
 
 
 @click.group()
@@ -16,8 +44,128 @@ def cli():
 @click.option('--module-path', required=True)
 @click.option('--target-dir', required=True)
 @click.option('--module-name', default=None)
-def generate(module_name, module_path, target_dir):
+@click.option('--template-cache-dir', default=None, envvar='SWRAP_TEMPLATE_CACHE_DIR',
+              help='Directory where compiled templates are cached between runs')
+@click.option('--force', is_flag=True, help='Regenerate every module even if its source is unchanged')
+@click.option('--jobs', '-j', default=1, type=click.IntRange(min=0),
+              help='Number of worker processes generating modules in parallel, 0 for one per CPU')
+@click.option('--static', is_flag=True, help='Extract modules from their source (.py or .pyi) without importing them')
+@click.option('--max-union-overloads', default=MAX_UNION_OVERLOADS, type=click.IntRange(min=1),
+              help='Functions whose Union parameters expand to more overloads get one type-erased wrapper')
+@click.option('--numeric-lists', is_flag=True,
+              help='Return List[float] and List[int] as Swift [Double] and [Int], copied in one go through the buffer protocol')
+@click.option('--instrument', is_flag=True,
+              help='Count the calls into python of the generated code and time them, in the TPythonMetrics registry')
+@click.option('--crossings-report', is_flag=True,
+              help='Write the calls into python each generated member makes to <swift module>.crossings.json')
+@click.option('--profile', 'profile_path', default=None, type=click.Path(dir_okay=False),
+              help='Write the time, calls and peak memory of each phase, module and class to this JSON file and print the '
+                   'slowest ones. Modules are generated serially, and only those that aren\'t up to date unless --force')
+@click.option('--profile-top', default=10, type=click.IntRange(min=1), help='Modules and classes listed in the --profile summary')
+@click.option('--profile-pstats', default=None, type=click.Path(dir_okay=False), help='Dump cProfile stats of the run to this file')
+@output_layout_options
+def generate(module_name, module_path, target_dir, template_cache_dir, force, jobs, static, max_union_overloads, numeric_lists,
+             instrument, crossings_report, profile_path, profile_top, profile_pstats, shard_size, swift_package):
     """Build Swift wrappers for python module"""
-    if not (Path(module_path) / 'builtins.stub.py').exists():
-        copy(Path(__file__).parent.parent / 'stubs/builtins.stub.py', module_path)
-    build_swift_wrappers_module(module_name, module_path, target_dir)
+    apply_output_layout(shard_size, swift_package)
+    set_bytecode_cache_dir(template_cache_dir)
+    set_max_union_overloads(max_union_overloads)
+    set_numeric_list_mappings(numeric_lists)
+    set_instrumentation(instrument)
+    copy_builtins_stub(module_path)
+    if profile_path or profile_pstats:
+        jobs = 1
+    profiler = start_profiling() if profile_path else None
+    cprofile = cProfile.Profile() if profile_pstats else None
+    if cprofile:
+        cprofile.enable()
+    try:
+        build_swift_wrappers_module(module_name, module_path, target_dir, force=force, jobs=jobs, static=static,
+                                    crossings_report=crossings_report)
+    finally:
+        if cprofile:
+            cprofile.disable()
+            cprofile.dump_stats(profile_pstats)
+        if profiler:
+            stop_profiling()
+    if profiler:
+        Path(profile_path).write_text(json.dumps(profiler.report(), indent=2) + '\n')
+        click.echo(profiler.summary(profile_top), err=True)
+
+
+@cli.command()
+@click.option('--module-path', required=True)
+@click.option('--ir-dir', required=True, help='Directory where the extracted modules are written, one <module>.ir.json each')
+@click.option('--module-name', default=None)
+@click.option('--force', is_flag=True, help='Extract every module even if its source and the options are unchanged')
+@click.option('--static', is_flag=True, help='Extract modules from their source (.py or .pyi) without importing them')
+@click.option('--max-union-overloads', default=MAX_UNION_OVERLOADS, type=click.IntRange(min=1),
+              help='Functions whose Union parameters expand to more overloads get one type-erased wrapper')
+@click.option('--numeric-lists', is_flag=True,
+              help='Return List[float] and List[int] as Swift [Double] and [Int], copied in one go through the buffer protocol')
+def extract(module_name, module_path, ir_dir, force, static, max_union_overloads, numeric_lists):
+    """Extract python modules into IR files that swrap render turns into Swift wrappers"""
+    set_max_union_overloads(max_union_overloads)
+    set_numeric_list_mappings(numeric_lists)
+    copy_builtins_stub(module_path)
+    extracted = build_ir(module_name, module_path, ir_dir, static=static, force=force)
+    click.echo(f'Extracted {len(extracted)} modules' + (f': {", ".join(extracted)}' if extracted else ''))
+
+
+@cli.command()
+@click.option('--ir-dir', required=True, help='Directory written by swrap extract')
+@click.option('--target-dir', required=True)
+@click.option('--template-cache-dir', default=None, envvar='SWRAP_TEMPLATE_CACHE_DIR',
+              help='Directory where compiled templates are cached between runs')
+@click.option('--instrument', is_flag=True,
+              help='Count the calls into python of the generated code and time them, in the TPythonMetrics registry')
+@output_layout_options
+def render(ir_dir, target_dir, template_cache_dir, instrument, shard_size, swift_package):
+    """Render the Swift wrappers of extracted modules, without importing any python source"""
+    apply_output_layout(shard_size, swift_package)
+    set_bytecode_cache_dir(template_cache_dir)
+    set_instrumentation(instrument)
+    render_ir(ir_dir, target_dir)
+
+
+@cli.command()
+@click.option('--module-path', required=True)
+@click.option('--target-dir', required=True)
+@click.option('--module-name', default=None)
+@click.option('--static', is_flag=True, help='Extract modules from their source (.py or .pyi) without importing them')
+@click.option('--max-union-overloads', default=MAX_UNION_OVERLOADS, type=click.IntRange(min=1),
+              help='Functions whose Union parameters expand to more overloads get one type-erased wrapper')
+@click.option('--numeric-lists', is_flag=True,
+              help='Return List[float] and List[int] as Swift [Double] and [Int], copied in one go through the buffer protocol')
+@click.option('--instrument', is_flag=True,
+              help='Count the calls into python of the generated code and time them, in the TPythonMetrics registry')
+@click.option('--interval', default=0.05, type=click.FloatRange(min=0.001), help='Seconds between checks of the sources')
+@click.option('--socket', 'socket_path', default=None, type=click.Path(dir_okay=False),
+              help='Also serve regenerate and status requests on this unix socket')
+@output_layout_options
+def watch(module_name, module_path, target_dir, static, max_union_overloads, numeric_lists, instrument, interval, socket_path,
+          shard_size, swift_package):
+    """Keep the Swift wrappers up to date, regenerating the modules whose source changes"""
+    apply_output_layout(shard_size, swift_package)
+    set_max_union_overloads(max_union_overloads)
+    set_numeric_list_mappings(numeric_lists)
+    set_instrumentation(instrument)
+    copy_builtins_stub(module_path)
+    watcher = Watcher(module_name, module_path, target_dir, static=static)
+    server = serve_in_background(socket_path, watcher) if socket_path else None
+    try:
+        while True:
+            update = watcher.update()
+            for name in update.regenerated:
+                click.echo(f'Regenerated {name}' + (f' in {update.seconds * 1000:.0f} ms' if len(update.regenerated) == 1 else ''))
+            for name in update.removed:
+                click.echo(f'Removed {name}')
+            for name, error in update.errors.items():
+                click.echo(f'Error regenerating {name}: {error}', err=True)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
@@ -1,35 +1,207 @@
 import inspect
-import re
+import os
 import sys
-from copy import deepcopy
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
 from importlib import util
+from itertools import product
+from operator import mul
 from pathlib import Path
 from types import SimpleNamespace
-from typing import List, Union
-
-from swift_python_wrapper.overload_parser import parse_overloads
+from typing import List, Union, Tuple, Optional, Dict, NamedTuple, Iterator, Any, Iterable
+
+from swift_python_wrapper.crossings import write_crossings_report
+from swift_python_wrapper.layout import shard_size, swift_package, write_module_files, write_swift_package, remove_stale_shards, \
+    module_dir, module_files, scan_definitions, set_output_layout
+from swift_python_wrapper.manifest import Manifest, hash_file, write_if_changed, write_stream_if_changed
+from swift_python_wrapper.module_index import ModuleIndex, ClassIndex, build_module_index, parse_swift_wrapper_annotations
+from swift_python_wrapper.overload_parser import parse_overloads, parse_module_overloads
+from swift_python_wrapper.profiling import phase, profiled
 from swift_python_wrapper.rendering import SwiftClass, NameAndType, Function, SwiftModule, _render, MagicMethods, \
-    BinaryMagicMethod, UnaryMagicMethod, ExpressibleByLiteralProtocol
+    BinaryMagicMethod, UnaryMagicMethod, ExpressibleByLiteralProtocol, instrumentation, set_instrumentation, bytecode_cache_dir, \
+    set_bytecode_cache_dir
+from swift_python_wrapper.static_extraction import get_static_source, create_static_module_orm
+from swift_python_wrapper.type_mapping import numeric_list_mappings, set_numeric_list_mappings, _convert_cached
 
 
 class BrokenImportError(Exception):
     pass
 
 
-def build_swift_wrappers_module(module_name, module_path, target_dir):
-    modules = [
-        load_module_from_path(
-            module_name=module_name or Path(module_path).stem,
-            module_path=module_path,
-        )
-    ] if Path(module_path).is_file() else [
-        load_module_from_path(
-            module_name=Path(path).stem,
-            module_path=str(path),
+class UnionOverloadLimitWarning(UserWarning):
+    pass
+
+
+MAX_UNION_OVERLOADS = 64
+BATCH_ANNOTATION = 'Batch'  # SWIFT_WRAPPER.<function>: Batch
+SOURCE_SUFFIXES = ('.py', '.pyi')
+_max_union_overloads = MAX_UNION_OVERLOADS
+_worker_settings: Optional[Dict[str, Any]] = None
+
+
+class RenderedModule(NamedTuple):
+    module_name: str
+    swift_module_name: str
+    output_hash: str  # Of the main file
+    output_file: str  # Main file, relative to the target dir
+
+
+class ModulePackage(NamedTuple):
+    swift_module_name: str
+    declared: bool  # False if no module was generated for the package, so the index declares an empty namespace for it
+    submodules: List[Tuple[str, str]]  # Name and Swift module name of each direct submodule
+
+
+def build_swift_wrappers_module(module_name, module_path, target_dir, force: bool = False, jobs: int = 1, static: bool = False,
+                                crossings_report: bool = False):
+    settings = generation_settings(static)
+    manifest = Manifest(target_dir, settings=settings) if force else Manifest.load(target_dir, settings=settings)
+    names, source_hashes = [], {}
+
+    def stale_sources() -> Iterator[Tuple[str, str]]:
+        for name, path in get_module_sources(module_name, module_path, static=static):
+            names.append(name)
+            source_hashes[name] = hash_file(path)
+            if not manifest.is_up_to_date(name, source_hashes[name]):
+                yield name, path
+
+    rendered_modules = render_modules(stale_sources(), target_dir=target_dir, jobs=jobs, static=static)
+    with phase('typed_python', module=''):
+        rewritten = write_typed_python_index(target_dir, [SwiftModule(module_name=name, vars=[], functions=[], classes=[]) for name in names])
+    for module in rendered_modules:
+        manifest.record(
+            module.module_name,
+            source_hash=source_hashes[module.module_name],
+            output_file=module.output_file,
+            output_hash=module.output_hash,
         )
-        for path in Path(module_path).iterdir() if path.is_file()
-    ]
-    create_typed_python([create_module_orm(module) for module in modules], target_path=target_dir)
+    for name, output_hash in rewritten.items():
+        manifest.update_output_hash(name, output_hash)
+    manifest.prune(names)
+    manifest.save()
+    if crossings_report:
+        for name in names:
+            swift_module_name = SwiftModule(module_name=name, vars=[], functions=[], classes=[]).swift_module_name
+            swift_paths = list(module_files(module_dir(target_dir, name), swift_module_name))
+            if swift_paths:
+                write_crossings_report(name, swift_paths[0], shard_paths=swift_paths[1:])
+
+
+def generation_settings(static: bool) -> Dict[str, Any]:
+    """Options that change the generated code, recorded in the manifest"""
+    return dict(static=static, max_union_overloads=_max_union_overloads, numeric_lists=numeric_list_mappings(), instrument=instrumentation(),
+                shard_size=shard_size(), swift_package=swift_package())
+
+
+def render_module(module_name: str, module_path: str, target_dir: str, static: bool = False) -> RenderedModule:
+    """
+    Loads, extracts and renders a single module into target_dir. This is the unit of work of parallel generation.
+    With static the module is extracted from its source without being imported.
+    """
+    with phase('module', module=module_name):
+        return write_module(extract_module(module_name, module_path, static=static), target_dir)
+
+
+def extract_module(module_name: str, module_path: str, static: bool = False) -> SwiftModule:
+    if static:
+        return create_static_module_orm(module_name=module_name, module_path=module_path)
+    with phase('load'):
+        module = load_module_from_path(module_name=module_name, module_path=module_path)
+    return create_module_orm(module)
+
+
+def render_modules(sources: Iterable[Tuple[str, str]], target_dir: str, jobs: int = 1, static: bool = False) -> List[RenderedModule]:
+    """
+    Renders (module name, path) sources, in a pool of worker processes if jobs > 1 (0 uses one per CPU).
+    Serially, each source is rendered as soon as it's produced. In parallel the sources are listed first, so that the
+    largest modules can be scheduled first and one big stub doesn't finish alone. Results keep the order of sources.
+    """
+    if jobs != 1:
+        sources = list(sources)
+    if jobs == 1 or len(sources) < 2:
+        return [render_module(name, path, target_dir, static=static) for name, path in sources]
+    largest_first = sorted(sources, key=lambda source: Path(source[1]).stat().st_size, reverse=True)
+    settings = worker_settings()
+    with ProcessPoolExecutor(max_workers=jobs or None) as executor:
+        futures = {name: executor.submit(_render_in_worker, settings, name, path, target_dir, static) for name, path in largest_first}
+        return [futures[name].result() for name, _ in sources]
+
+
+def worker_settings() -> Dict[str, Any]:
+    """Module level settings a worker process needs to render like this one"""
+    return dict(template_cache_dir=bytecode_cache_dir(), max_union_overloads=_max_union_overloads, numeric_lists=numeric_list_mappings(),
+                instrument=instrumentation(), shard_size=shard_size(), swift_package=swift_package())
+
+
+def init_worker(settings: Dict[str, Any]):
+    """
+    Applies worker_settings() of the parent process, which a worker only inherits if it's forked. Applied once per
+    worker, as the template cache is reset by a change of its directory.
+    """
+    global _worker_settings
+    if settings == _worker_settings:
+        return
+    set_bytecode_cache_dir(settings['template_cache_dir'])
+    set_max_union_overloads(settings['max_union_overloads'])
+    set_numeric_list_mappings(settings['numeric_lists'])
+    set_instrumentation(settings['instrument'])
+    set_output_layout(shard_size=settings['shard_size'], swift_package=settings['swift_package'])
+    _worker_settings = settings
+
+
+def _render_in_worker(settings: Dict[str, Any], module_name: str, module_path: str, target_dir: str, static: bool) -> RenderedModule:
+    # ProcessPoolExecutor has no initializer before Python 3.7, so the settings come with every task
+    init_worker(settings)
+    return render_module(module_name, module_path, target_dir, static=static)
+
+
+def write_module(module: SwiftModule, target_path: str) -> RenderedModule:
+    """
+    Streams the module's Swift code to its file, or to its shards and package target directory if the output layout
+    asks for them, so the whole output is never held in memory
+    """
+    with phase('write'):
+        if shard_size() is not None or swift_package() is not None:
+            output_file, output_hash = write_module_files(module, target_path, profiled('render', module.fragments()))
+        else:
+            output_file = f'{module.swift_module_name}.swift'
+            output_hash = write_stream_if_changed(Path(target_path) / output_file, profiled('render', module.generate()))
+            remove_stale_shards(Path(target_path), module.swift_module_name, 1)
+    return RenderedModule(module_name=module.module_name, swift_module_name=module.swift_module_name, output_hash=output_hash,
+                          output_file=output_file)
+
+
+def get_module_sources(module_name, module_path, static: bool = False) -> Iterator[Tuple[str, str]]:
+    """
+    Module names and file paths to generate wrappers for. A directory is walked recursively and lazily, one directory
+    listing at a time, and its modules are named after the package layout: a/b/c.py is a.b.c and a/b/__init__.py is
+    a.b. With a directory, module_name is the package the modules belong to. Stubs (.pyi) can only be extracted
+    statically, where they're preferred to the source of the same module.
+    """
+    if Path(module_path).is_file():
+        yield module_name or Path(module_path).stem, module_path
+    else:
+        yield from _walk_package(str(module_path), module_name, SOURCE_SUFFIXES if static else ('.py',))
+
+
+def _walk_package(directory: str, package: Optional[str], suffixes: Tuple[str, ...]) -> Iterator[Tuple[str, str]]:
+    with os.scandir(directory) as scanned:
+        entries = sorted(scanned, key=lambda x: x.name)
+    # A module with both a source and a stub is generated once, from the stub
+    stubs = {x.name[:-len('.pyi')] for x in entries if x.name.endswith('.pyi') and x.is_file()} if '.pyi' in suffixes else set()
+    for entry in entries:
+        if entry.is_dir():
+            if entry.name.isidentifier() and entry.name != '__pycache__':
+                yield from _walk_package(entry.path, f'{package}.{entry.name}' if package else entry.name, suffixes)
+        elif entry.is_file() and entry.name.endswith(suffixes):
+            stem = entry.name.rsplit('.', 1)[0]
+            if entry.name.endswith('.py') and stem in stubs:
+                continue
+            if stem == '__init__' and package:
+                yield package, entry.path
+            else:
+                yield f'{package}.{stem}' if package else stem, entry.path
 
 
 def load_module_from_path(module_name: str, module_path: str):
@@ -43,66 +215,128 @@ def load_module_from_path(module_name: str, module_path: str):
     return module
 
 
-def get_module_classes(module) -> List[SwiftClass]:
-    return [create_class_orm(obj) for name, obj in inspect.getmembers(module) if inspect.isclass(obj) and obj.__module__ == module.__name__ and can_get_source(obj)]
+def get_module_classes(module, index: Optional[ModuleIndex] = None) -> List[SwiftClass]:
+    return [
+        create_class_orm(obj, index=index)
+        for name, obj in inspect.getmembers(module)
+        if inspect.isclass(obj) and obj.__module__ == module.__name__ and (get_class_index(obj, index) is not None or can_get_source(obj))
+    ]
+
+
+def get_source(obj) -> str:
+    static_source = get_static_source(obj)
+    if static_source is not None:
+        return static_source
+    try:
+        return inspect.getsource(obj)
+    except OSError:
+        # inspect finds no source in an empty file, which most package __init__.py are
+        path = getattr(obj, '__file__', None) if inspect.ismodule(obj) else None
+        if path is not None and os.path.isfile(path) and os.path.getsize(path) == 0:
+            return ''
+        raise
+
+
+def get_module_index(module) -> Optional[ModuleIndex]:
+    """Index of the module source, None if the source isn't available"""
+    if module is None:
+        return None
+    try:
+        return build_module_index(module.__name__, get_source(module))
+    except (OSError, TypeError, SyntaxError):
+        return None
+
+
+def get_class_index(cls, index: Optional[ModuleIndex] = None) -> Optional[ClassIndex]:
+    """Index of a top level class, from the index of its module (looked up if not given)"""
+    if cls.__qualname__ != cls.__name__:
+        return None
+    if index is None:
+        index = get_module_index(sys.modules.get(cls.__module__))
+    return index.classes.get(cls.__name__) if index is not None and index.module_name == cls.__module__ else None
 
 
 def can_get_source(obj) -> bool:
     try:
-        inspect.getsource(obj)
+        get_source(obj)
         return True
     except OSError:
         return False
 
 
-def get_module_functions(module) -> List[Function]:
+def mark_keyword_args(args: List[NameAndType], func) -> List[NameAndType]:
+    """
+    Args are passed positionally as long as they follow the positional parameters of func in order. Keyword-only and
+    variadic parameters, and every parameter after one that the wrapper doesn't pass, are passed by keyword.
+    """
+    try:
+        parameters = inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return [x._replace(keyword=True) for x in args]
+    passed = {x.name for x in args}
+    keyword = set()
+    skipped = False
+    for name, parameter in parameters.items():
+        if name == 'self':
+            continue
+        if parameter.kind not in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD):
+            keyword.add(name)
+        elif name not in passed:
+            skipped = True
+        elif skipped:
+            keyword.add(name)
+    return [x._replace(keyword=True) if x.name in keyword or x.name not in parameters else x for x in args]
+
+
+def get_module_functions(module, index: Optional[ModuleIndex] = None) -> List[Function]:
     functions = [
         Function(
             name=func.__name__,
-            args=[NameAndType(name=k, type=v) for k, v in func.__annotations__.items() if k != 'return'],
+            args=mark_keyword_args([NameAndType(name=k, type=v) for k, v in func.__annotations__.items() if k != 'return'], func),
             cls='modulefunction',
             return_type=func.__annotations__.get('return'),
         )
         for func in
         [obj[1] for obj in inspect.getmembers(module) if inspect.isfunction(obj[1]) and not obj[1].__name__ in ['overload', '_overload_dummy']]
     ]
-    overloads = get_overloads(module, is_module=True)
+    overloads = get_overloads(module, is_module=True, parsed=index.overloads if index is not None else None)
     functions = [x for x in functions if x.name not in {f.name for f in overloads}] + overloads
-    return flatten_functions(functions)
+    if index is not None:
+        functions = [x._replace(batch=True) if BATCH_ANNOTATION in index.swift_wrapper_annotations.get(x.name, []) else x for x in functions]
+    return flatten_functions(functions, owner=module.__name__)
 
 
 def create_module_orm(module) -> SwiftModule:
-    return SwiftModule(
-        module_name=module.__name__,
-        vars=[NameAndType(name=k, type=v) for k, v in getattr(module, '__annotations__', {}).items()],
-        functions=get_module_functions(module),
-        classes=get_module_classes(module),
-    )
+    with phase('extract'):
+        with phase('index'):
+            index = get_module_index(module)
+        return SwiftModule(
+            module_name=module.__name__,
+            vars=[NameAndType(name=k, type=v) for k, v in getattr(module, '__annotations__', {}).items()],
+            functions=get_module_functions(module, index),
+            classes=get_module_classes(module, index),
+        )
 
 
-def is_static_method(cls, name: str) -> bool:
-    method_class = None
-    for c in [cls, *getattr(cls, '__bases__', [])]:
-        try:
-            method_class = c.__dict__[name].__class__
-            break
-        except KeyError:
-            pass
-    if method_class is None:
-        raise ValueError(f'Method {name} not found in class {cls} or any of its superclasses')
-    return method_class == staticmethod or method_class == classmethod
+def get_method_kinds(cls) -> Dict[str, type]:
+    """Class of every attribute in the class or its superclasses (function, staticmethod, classmethod...)"""
+    kinds = {}
+    for c in reversed(cls.__mro__):
+        kinds.update({name: value.__class__ for name, value in vars(c).items()})
+    return kinds
 
 
-def get_functions(cls) -> List[Function]:
+def get_functions(cls, class_index: Optional[ClassIndex] = None) -> List[Function]:
+    method_kinds = get_method_kinds(cls)
     functions = [
         Function(
             name=func_name,
-            args=[
+            args=mark_keyword_args([
                 NameAndType(name=k, type=v.annotation, default_value=v.default)
                 for k, v in inspect.signature(func).parameters.items()
                 if k != 'return' and k != 'self'
-            ],
-            cls='staticmethod' if is_static_method(cls, func_name) else 'instancemethod',
+            ], func),
+            cls='staticmethod' if method_kinds.get(func_name) in (staticmethod, classmethod) else 'instancemethod',
             return_type=func.__annotations__.get('return'),
         )
         for func_name, func in
@@ -112,32 +346,64 @@ def get_functions(cls) -> List[Function]:
             if not func_name.startswith("__") and func_name not in ['overload', '_overload_dummy']
         ]
     ]
-    overloads = get_overloads(cls, is_module=False)
+    overloads = get_overloads(cls, is_module=False, parsed=class_index.overloads if class_index is not None else None)
     functions = [x for x in functions if x.name not in {f.name for f in overloads}] + overloads
-    return flatten_functions(functions)
+    return flatten_functions(functions, owner=f'{cls.__module__}.{cls.__qualname__}')
 
 
-def flatten_functions(functions) -> List[Function]:
+def set_max_union_overloads(limit: int):
+    """Functions whose Union parameters expand to more overloads than limit get a single type-erased wrapper"""
+    global _max_union_overloads
+    _max_union_overloads = limit
+
+
+def clear_caches():
+    """
+    Forgets the converted types, indexes and overloads of the sources extracted so far. A long running process calls it
+    before extracting a module again, as they're keyed on classes and sources that are then stale
+    """
+    _convert_cached.cache_clear()
+    build_module_index.cache_clear()
+    parse_module_overloads.cache_clear()
+
+
+def flatten_functions(functions, owner: str = '') -> List[Function]:
     result = []
-    for f in functions:
-        flattened_args = [[]]
-        for arg in f.args:
-            if arg.type.__class__ == type(Union):
-                new_flattened_args = []
-                for t in arg.type.__args__:
-                    flattened_args_copy = deepcopy(flattened_args)
-                    for l in flattened_args_copy:
-                        l.append(NameAndType(arg.name, t))
-                    new_flattened_args = new_flattened_args + flattened_args_copy
-                flattened_args = new_flattened_args
-            else:
-                for l in flattened_args:
-                    l.append(arg)
-        for l in flattened_args:
-            result.append(Function(name=f.name, args=l, cls=f.cls, return_type=f.return_type))
+    with phase('flatten'):
+        for f in functions:
+            result.extend(flatten_function(f, owner))
     return result
 
 
+def flatten_function(f: Function, owner: str = '') -> Iterator[Function]:
+    """
+    Lazily yields one function per combination of Union parameter members, skipping combinations that map to
+    the same Swift signature. If there would be more than the configured limit, the Union parameters are erased
+    to Any instead and a UnionOverloadLimitWarning names the function.
+    """
+    alternatives = [[NameAndType(arg.name, t, keyword=arg.keyword) for t in arg.type.__args__] if is_union(arg.type) else [arg] for arg in f.args]
+    overload_count = reduce(mul, [len(x) for x in alternatives], 1)
+    if overload_count > _max_union_overloads:
+        warnings.warn(
+            f'{owner}.{f.name}: {overload_count} Union overloads exceed the limit of {_max_union_overloads}, generating a type-erased wrapper',
+            UnionOverloadLimitWarning,
+        )
+        yield f._replace(args=[NameAndType(arg.name, Any, keyword=arg.keyword) if is_union(arg.type) else arg for arg in f.args])
+        return
+    seen_signatures = set()
+    # Reversed so that earlier parameters vary fastest, which is the order overloads have always been generated in
+    for reversed_args in product(*reversed(alternatives)):
+        args = list(reversed(reversed_args))
+        signature = tuple(arg.mapped_type for arg in args)
+        if signature not in seen_signatures:
+            seen_signatures.add(signature)
+            yield f._replace(args=args)
+
+
+def is_union(t) -> bool:
+    return t.__class__ == type(Union)
+
+
 binary_magic_mappings = {
     '__add__': ('+', None, float),
     '__sub__': ('-', None, float),
@@ -176,9 +442,11 @@ expressible_by_literal_protocols = {
 }
 
 
-def get_magic_methods(cls) -> MagicMethods:
+def get_magic_methods(cls, swift_wrapper_annotations: Optional[List[str]] = None) -> MagicMethods:
     magic_methods = {}
-    for func in [inspect.getattr_static(cls, func) for func in dir(cls) if callable(inspect.getattr_static(cls, func)) and func.startswith("__")]:
+    for func in [inspect.getattr_static(cls, name) for name in dir(cls) if name.startswith("__")]:
+        if not callable(func):
+            continue
         if func.__name__ in binary_magic_mappings.keys():
             signature = inspect.signature(func)
             symbol, protocol, default_type = binary_magic_mappings[func.__name__]
@@ -212,8 +480,21 @@ def get_magic_methods(cls) -> MagicMethods:
             #     magic_methods['DictLike'] = True
         elif func.__name__ == '__setitem__':
             magic_methods[func.__name__.lstrip('_')] = True
+        elif func.__name__ == '__iter__':
+            return_type = inspect.signature(func).return_annotation
+            magic_methods[func.__name__.lstrip('_')] = SimpleNamespace(
+                element_type=return_type.__args__[0] if getattr(return_type, '__args__', None) else None,
+            )
+            magic_methods['Sequence'] = True
+
+    getitem = magic_methods.get('getitem__')
+    if magic_methods.get('len__') and getitem and getattr(getitem.index_type, '__name__', None) == 'int':
+        magic_methods['RandomAccessCollection'] = True
+        magic_methods['Sequence'] = True
 
-    for protocol_name in get_swift_wrapper_annotations(cls):
+    if swift_wrapper_annotations is None:
+        swift_wrapper_annotations = get_swift_wrapper_annotations(cls)
+    for protocol_name in swift_wrapper_annotations:
         if protocol_name in expressible_by_literal_protocols.keys():
             magic_methods[protocol_name] = ExpressibleByLiteralProtocol(
                 protocol_name=protocol_name,
@@ -224,52 +505,98 @@ def get_magic_methods(cls) -> MagicMethods:
 
 
 def get_swift_wrapper_annotations(cls) -> List[str]:
-    result = []
-    for line in inspect.getsource(cls).splitlines(keepends=False):
-        for match in re.finditer(r'#\s*SWIFT_WRAPPER(\.\w+):\s*(\w+(?:\s*,\s*\w+)*)', line):
-            annotated_class, protocols = match.groups()
-            result += [x.strip() for x in protocols.split(',')]
-    return result
+    class_index = get_class_index(cls)
+    if class_index is not None:
+        return class_index.swift_wrapper_annotations
+    return parse_swift_wrapper_annotations(get_source(cls).splitlines(keepends=False))
 
 
 def get_init_params(cls) -> List[List[NameAndType]]:
-    params = [NameAndType(name=k, type=v) for k, v in inspect.getfullargspec(cls.__init__).annotations.items()]
-    flattened_params = flatten_functions([Function(name='__init__', args=params, cls=cls.__name__)])
+    params = mark_keyword_args([NameAndType(name=k, type=v) for k, v in inspect.getfullargspec(cls.__init__).annotations.items()], cls.__init__)
+    flattened_params = flatten_functions([Function(name='__init__', args=params, cls=cls.__name__)], owner=f'{cls.__module__}.{cls.__qualname__}')
     return [x.args for x in flattened_params]
 
 
-def create_class_orm(cls) -> SwiftClass:
-    static_vars = [NameAndType(name=k, type=v) for k, v in getattr(cls, '__annotations__', {}).items() if getattr(cls, k, False)]
-    instance_vars = \
-        ([NameAndType(name=x, type=None) for x in cls.__slots__] if hasattr(cls, '__slots__') else []) + \
-        [NameAndType(name=k, type=v) for k, v in getattr(cls, '__annotations__', {}).items()] + \
-        [NameAndType(name, type=getattr(prop.fget, '__annotations__', {}).get('return')) for name, prop in inspect.getmembers(cls, lambda o: isinstance(o, property))]
-    init_params = get_init_params(cls)
-    return SwiftClass(
-        object_name=cls.__name__,
-        module=cls.__module__,
-        static_vars=static_vars,
-        instance_vars=instance_vars,
-        init_params=init_params,
-        methods=get_functions(cls),
-        magic_methods=get_magic_methods(cls),
-        positional_args='CPython' in get_swift_wrapper_annotations(cls),
-        generic=getattr(cls, '__orig_bases__', [None])[0]
-    )
-
-
-def get_overloads(module_or_class, is_module: bool = False, magic_methods: bool = False):
-    indents = 0 if is_module else 1
-    overloads = parse_overloads(inspect.getsource(module_or_class), indentation=indents, module_or_class_name=module_or_class.__name__)
-    return [x for x in overloads if (magic_methods and x.name.startswith('__')) or (not magic_methods and not x.name.startswith('__'))]
+def create_class_orm(cls, index: Optional[ModuleIndex] = None) -> SwiftClass:
+    with phase('class', cls=cls.__name__):
+        class_index = get_class_index(cls, index)
+        swift_wrapper_annotations = class_index.swift_wrapper_annotations if class_index is not None else get_swift_wrapper_annotations(cls)
+        static_vars = [NameAndType(name=k, type=v) for k, v in getattr(cls, '__annotations__', {}).items() if getattr(cls, k, False)]
+        instance_vars = \
+            ([NameAndType(name=x, type=None) for x in cls.__slots__] if hasattr(cls, '__slots__') else []) + \
+            [NameAndType(name=k, type=v) for k, v in getattr(cls, '__annotations__', {}).items()] + \
+            [NameAndType(name, type=getattr(prop.fget, '__annotations__', {}).get('return')) for name, prop in inspect.getmembers(cls, lambda o: isinstance(o, property))]
+        init_params = get_init_params(cls)
+        return SwiftClass(
+            object_name=cls.__name__,
+            module=cls.__module__,
+            static_vars=static_vars,
+            instance_vars=instance_vars,
+            init_params=init_params,
+            methods=get_functions(cls, class_index),
+            magic_methods=get_magic_methods(cls, swift_wrapper_annotations),
+            positional_args='CPython' in swift_wrapper_annotations,
+            generic=getattr(cls, '__orig_bases__', [None])[0]
+        )
 
 
-def create_typed_python(modules: List[SwiftModule], target_path: str):
-    for module in modules:
-        code = module.render()
-        (Path(target_path) / f'{module.swift_module_name}.swift').write_text(code)
-    code = _render('typed_python.swift.j2', {'modules': modules})
-    (Path(target_path) / f'typed_python.swift').write_text(code)
+def get_overloads(module_or_class, is_module: bool = False, magic_methods: bool = False, parsed: Optional[List[Function]] = None):
+    """Overloads of a module or class, either already parsed (from the module index) or parsed from its source"""
+    with phase('overloads'):
+        if parsed is not None:
+            overloads = parsed
+        else:
+            indents = 0 if is_module else 1
+            overloads = parse_overloads(get_source(module_or_class), indentation=indents, module_or_class_name=module_or_class.__name__)
+        return [x for x in overloads if (magic_methods and x.name.startswith('__')) or (not magic_methods and not x.name.startswith('__'))]
+
+
+def create_typed_python(modules: List[SwiftModule], target_path: str, index_modules: Optional[List[SwiftModule]] = None) -> Dict[str, str]:
+    """
+    Writes the modules and the typed_python.swift index listing index_modules (modules by default).
+    Files whose content didn't change are left untouched. Returns the hash of each module's output by module name.
+    """
+    output_hashes = {module.module_name: write_module(module, target_path).output_hash for module in modules}
+    write_typed_python_index(target_path, modules if index_modules is None else index_modules)
+    return output_hashes
+
+
+def get_module_packages(modules: List[SwiftModule]) -> Tuple[List[Tuple[str, str]], List[ModulePackage]]:
+    """
+    Name and Swift module name of the top level modules, and the packages containing submodules, so that
+    TPython.import.a.b reaches a.b. A package without a module of its own, such as a namespace package, gets an empty
+    Swift namespace.
+    """
+    swift_names = {x.python_module_name: x.swift_module_name for x in modules}
+    top_level, submodules = {}, {}
+    for name in swift_names:
+        parts = name.split('.')
+        for i in range(len(parts)):
+            prefix = '.'.join(parts[:i + 1])
+            swift_name = swift_names.get(prefix, f'TPythonModule_{prefix.replace(".", "_")}')
+            children = submodules.setdefault('.'.join(parts[:i]), {}) if i else top_level
+            children.setdefault(parts[i], swift_name)
+    packages = [
+        ModulePackage(swift_module_name=swift_names.get(package, f'TPythonModule_{package.replace(".", "_")}'),
+                      declared=package in swift_names, submodules=list(children.items()))
+        for package, children in submodules.items()
+    ]
+    return list(top_level.items()), packages
+
+
+def write_typed_python_index(target_path: str, index_modules: List[SwiftModule]) -> Dict[str, str]:
+    """
+    Writes the typed_python.swift index, or the Package.swift of a Swift package layout. Returns the new hash of the
+    main file of each module the package rewrote. Raises LayoutError if modules define the same wrapper
+    """
+    top_level, packages = get_module_packages(index_modules)
+    if swift_package() is not None:
+        index = _render('typed_python.swift.j2', {'part': 'index', 'modules': top_level, 'packages': packages})
+        return write_swift_package(target_path, index_modules, index)
+    scan_definitions(target_path, index_modules)
+    code = _render('typed_python.swift.j2', {'modules': top_level, 'packages': packages})
+    write_if_changed(Path(target_path) / f'typed_python.swift', code)
+    return {}
 
 
 if __name__ == '__main__':
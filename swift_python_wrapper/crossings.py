@@ -0,0 +1,104 @@
+"""
+Counts the calls into python each member of the generated Swift code makes, to find members that cross the
+boundary more often than they need to.
+
+The count is static and per call of the member: attribute lookups, calls, item access, conversions of python
+values to Swift ones and so on each count as one crossing (.tupleN as one per element). Crossings inside loops
+and closures over python sequences are counted once, and crossings made by other generated members (a module
+function building a class through its init) are counted in those members.
+"""
+import json
+import re
+from pathlib import Path
+from typing import NamedTuple, List, Pattern, Callable, Tuple, Iterable
+
+from swift_python_wrapper.manifest import write_if_changed
+
+_MODIFIERS = r'(?:(?:public|private|fileprivate|internal|final|static|class|mutating|override)\s+)*'
+DECLARATION = re.compile(
+    rf'^[ \t]*{_MODIFIERS}(?:(?:struct|class|enum|extension)\s+(?P<type>\w+)|(?P<member>(?:func|var|init|subscript)\b))[^\n{{]*\{{',
+    re.MULTILINE,
+)
+
+CROSSINGS: List[Tuple[Pattern, Callable]] = [
+    # Attribute lookups
+    (re.compile(r'\[dynamicMember: "'), lambda m: 1),
+    # Calls to cached handles, classes and runtime functions
+    (re.compile(r'\b(?:_py\w*|wrappedClass|_snapshotGetter|TPythonBatch|TPythonIsNone)\('), lambda m: 1),
+    (re.compile(r'\bPython\.\w+\('), lambda m: 1),
+    # Method calls through dynamic member lookup look the method up and then call it
+    (re.compile(r'\bwrappedInstance\.(?!description\b|makeIterator\b)\w+\('), lambda m: 2),
+    (re.compile(r'\bwrappedInstance\[(?!dynamicMember)'), lambda m: 1),
+    (re.compile(r'\bvalues\[\d+\]'), lambda m: 1),  # Fields of a snapshot too large for .tupleN
+    (re.compile(r'\.tuple(\d+)\b'), lambda m: int(m.group(1))),
+    (re.compile(r'== Python\.None\b'), lambda m: 1),
+    (re.compile(r'\.description\b|\.makeIterator\(\)|\bpythonIterator\.next\(\)'), lambda m: 1),
+    (re.compile(r'(?:\)|\bvals)\.map \{'), lambda m: 1),
+    # Conversions to Swift values, buffers count as one since their cost doesn't depend on their length
+    (re.compile(r'(?<![\w.\]])(?:Int|Double|Float|String|Bool|TPbool)\(|\(pythonBuffer: '), lambda m: 1),
+]
+
+
+class MemberCrossings(NamedTuple):
+    type_name: str  # Dotted path of the enclosing Swift types, empty for top level members
+    member: str  # Declaration of the member, up to its body
+    crossings: int
+
+
+def count_crossings(code: str) -> int:
+    return sum(crossings(match) for pattern, crossings in CROSSINGS for match in pattern.finditer(code))
+
+
+def analyze_crossings(code: str) -> List[MemberCrossings]:
+    """Crossings of every func, computed var, init and subscript of the Swift code, in order"""
+    members = []
+    scopes = []  # Enclosing types and the offset of their closing brace
+    position = 0
+    for match in iter(lambda: DECLARATION.search(code, position), None):
+        opening = match.end() - 1
+        closing = _closing_brace(code, opening)
+        while scopes and scopes[-1][1] < match.start():
+            scopes.pop()
+        if match.group('type'):
+            scopes.append((match.group('type'), closing))
+            position = match.end()
+        else:
+            members.append(MemberCrossings(
+                type_name='.'.join(name for name, _ in scopes),
+                member=' '.join(code[match.start():opening].split()),
+                crossings=count_crossings(code[opening + 1:closing]),
+            ))
+            position = closing + 1
+    return members
+
+
+def _closing_brace(code: str, opening: int) -> int:
+    depth = 0
+    for i in range(opening, len(code)):
+        if code[i] == '{':
+            depth += 1
+        elif code[i] == '}':
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(code)
+
+
+def crossings_report(module_name: str, code: str) -> dict:
+    members = analyze_crossings(code)
+    return {
+        'module': module_name,
+        'total': sum(x.crossings for x in members),
+        'members': [x._asdict() for x in members],
+    }
+
+
+def write_crossings_report(module_name: str, swift_path: Path, shard_paths: Iterable[Path] = ()) -> Path:
+    """
+    Writes the report of the generated swift_path, and of the other shards of the module if it's sharded, next to it
+    as <swift module>.crossings.json
+    """
+    report_path = swift_path.with_suffix('.crossings.json')
+    report = crossings_report(module_name, '\n'.join(path.read_text() for path in [swift_path, *shard_paths]))
+    write_if_changed(report_path, json.dumps(report, indent=2) + '\n')
+    return report_path
@@ -0,0 +1,354 @@
+"""
+Serialized intermediate representation of the extracted SwiftModule, written by swrap extract and read by swrap
+render. Rendering from IR files never imports the python sources, and since the IR only depends on the sources and
+the extraction options, template changes don't invalidate it.
+
+Each module is a JSON file, <module>.ir.json. Annotations are stored as type references:
+
+    "str"                                        string annotation, as written
+    {"class": "Vector2D", "module": "mathy"}     class, by qualified name
+    {"typing": "Any"}                            unsubscripted typing object
+    {"origin": {...}, "args": [...]}             subscripted generic, such as Union[int, None] or Tuple[int, float]
+    {"typevar": "T"}, {"forward": "Vector2D"}    TypeVar and forward reference
+    null                                         no annotation
+
+Classes of builtins, typing and inspect are resolved to the real ones when loading. Any other class becomes an empty
+stand-in with the same name and module, like unresolved names in static extraction, which is all rendering needs.
+"""
+import builtins
+import collections.abc
+import hashlib
+import inspect
+import json
+import typing
+from functools import lru_cache
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, TypeVar, GenericMeta, _ForwardRef
+
+from swift_python_wrapper.core import extract_module, get_module_sources, write_module, write_typed_python_index, \
+    RenderedModule, generation_settings
+from swift_python_wrapper.manifest import GENERATOR_VERSION, hash_file, write_if_changed
+from swift_python_wrapper.profiling import phase
+from swift_python_wrapper.rendering import NameAndType, Function, SwiftClass, SwiftModule, MagicMethods, \
+    BinaryMagicMethod, UnaryMagicMethod, ExpressibleByLiteralProtocol
+from swift_python_wrapper.type_mapping import set_numeric_list_mappings
+
+IR_VERSION = 1
+IR_SUFFIX = '.ir.json'
+
+# Modules whose code changes the extracted model. rendering.py holds the model as well as the rendering
+EXTRACTOR_MODULES = ['core.py', 'ir.py', 'module_index.py', 'overload_parser.py', 'rendering.py', 'static_extraction.py',
+                     'type_mapping.py']
+
+RESOLVABLE_MODULES = {
+    'builtins': dict(vars(builtins), NoneType=type(None)),
+    'typing': typing,
+    'inspect': inspect,
+    'collections.abc': collections.abc,
+}
+
+_typing_names = {id(getattr(typing, name)): name for name in typing.__all__}
+
+
+class IRError(Exception):
+    pass
+
+
+class Expression:
+    """Default value that isn't a JSON scalar, kept as the text it renders to"""
+    def __init__(self, text: str):
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+    def __eq__(self, other):
+        return isinstance(other, Expression) and other.text == self.text
+
+    def __hash__(self):
+        return hash(self.text)
+
+
+class IRModule(NamedTuple):
+    module: SwiftModule
+    source_hash: str
+    settings: Dict[str, Any]
+
+
+def extraction_settings(static: bool) -> Dict[str, Any]:
+    """Generation options that change the extracted model, rather than only how it's rendered"""
+    settings = generation_settings(static)
+    return {k: settings[k] for k in ['static', 'max_union_overloads', 'numeric_lists']}
+
+
+@lru_cache(maxsize=None)
+def extractor_hash() -> str:
+    """
+    Hash of the IR version and the code that extracts the model. Unlike the manifest's, templates and the modules that
+    only render, lay out or report on the output aren't part of it
+    """
+    h = hashlib.sha256(f'{GENERATOR_VERSION}/{IR_VERSION}'.encode())
+    for path in sorted(Path(__file__).parent / x for x in EXTRACTOR_MODULES):
+        h.update(path.name.encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def ir_path(ir_dir: str, module_name: str) -> Path:
+    return Path(ir_dir) / f'{module_name}{IR_SUFFIX}'
+
+
+def module_to_ir(module: SwiftModule, source_hash: str = '', settings: Optional[Dict[str, Any]] = None) -> dict:
+    return {
+        'version': IR_VERSION,
+        'extractor': extractor_hash(),
+        'source_hash': source_hash,
+        'settings': settings or {},
+        'module_name': module.module_name,
+        'vars': [_encode_var(x) for x in module.vars],
+        'functions': [_encode_function(x) for x in module.functions],
+        'classes': [_encode_class(x) for x in module.classes],
+    }
+
+
+def module_from_ir(data: dict) -> SwiftModule:
+    if data.get('version') != IR_VERSION:
+        raise IRError(f'Unsupported IR version {data.get("version")!r} of module {data.get("module_name")!r}, expected {IR_VERSION}')
+    decoder = _TypeDecoder()
+    return SwiftModule(
+        module_name=data['module_name'],
+        vars=[decoder.var(x) for x in data['vars']],
+        functions=[decoder.function(x) for x in data['functions']],
+        classes=[decoder.swift_class(x) for x in data['classes']],
+    )
+
+
+def write_ir(path: Path, module: SwiftModule, source_hash: str = '', settings: Optional[Dict[str, Any]] = None) -> str:
+    return write_if_changed(path, json.dumps(module_to_ir(module, source_hash, settings), separators=(',', ':')) + '\n')
+
+
+def read_ir(path: Path) -> IRModule:
+    try:
+        data = json.loads(path.read_text())
+        return IRModule(module=module_from_ir(data), source_hash=data['source_hash'], settings=data['settings'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise IRError(f'Invalid IR file {path}: {e}') from e
+
+
+def is_ir_up_to_date(path: Path, source_hash: str, settings: Dict[str, Any]) -> bool:
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return False
+    return data.get('version') == IR_VERSION and data.get('extractor') == extractor_hash() and \
+        data.get('source_hash') == source_hash and data.get('settings') == settings
+
+
+def build_ir(module_name, module_path, ir_dir: str, static: bool = False, force: bool = False) -> List[str]:
+    """
+    Extracts the modules of module_path into IR files in ir_dir, skipping those extracted from the same source with
+    the same options, and deletes the IR of modules that no longer exist. Returns the names of the extracted modules.
+    """
+    Path(ir_dir).mkdir(parents=True, exist_ok=True)
+    settings = extraction_settings(static)
+    names, extracted = set(), []
+    for name, path in get_module_sources(module_name, module_path, static=static):
+        names.add(name)
+        source_hash = hash_file(path)
+        if not force and is_ir_up_to_date(ir_path(ir_dir, name), source_hash, settings):
+            continue
+        with phase('module', module=name):
+            module = extract_module(name, path, static=static)
+            with phase('write'):
+                write_ir(ir_path(ir_dir, name), module, source_hash, settings)
+        extracted.append(name)
+    for path in Path(ir_dir).glob(f'*{IR_SUFFIX}'):
+        if path.name[:-len(IR_SUFFIX)] not in names:
+            path.unlink()
+    return extracted
+
+
+def render_ir(ir_dir: str, target_dir: str) -> List[RenderedModule]:
+    """Renders every IR file in ir_dir and the typed_python.swift index listing them, without importing any source"""
+    Path(target_dir).mkdir(parents=True, exist_ok=True)
+    rendered, modules = [], []
+    for path in sorted(Path(ir_dir).glob(f'*{IR_SUFFIX}')):
+        with phase('module', module=path.name[:-len(IR_SUFFIX)]):
+            with phase('load'):
+                ir = read_ir(path)
+            # Conversions are rendered with the list mappings the model was extracted (and its overloads merged) with
+            set_numeric_list_mappings(ir.settings.get('numeric_lists', False))
+            rendered.append(write_module(ir.module, target_dir))
+        modules.append(SwiftModule(module_name=ir.module.module_name, vars=[], functions=[], classes=[]))
+    with phase('typed_python', module=''):
+        write_typed_python_index(target_dir, modules)
+    return rendered
+
+
+def encode_type(t) -> Any:
+    if t is None or isinstance(t, str):
+        return t
+    if t is Ellipsis:
+        return {'ellipsis': True}
+    if isinstance(t, TypeVar):
+        return {'typevar': t.__name__}
+    if isinstance(t, _ForwardRef):
+        return {'forward': t.__forward_arg__}
+    if getattr(t, '__origin__', None) is not None and getattr(t, '__args__', None):
+        return {'origin': encode_type(t.__origin__), 'args': [encode_type(x) for x in t.__args__]}
+    if isinstance(t, type):
+        encoded = {'class': t.__qualname__, 'module': t.__module__}
+        if isinstance(t, GenericMeta) and t.__parameters__ and t.__module__ not in RESOLVABLE_MODULES:
+            encoded['parameters'] = [encode_type(x) for x in t.__parameters__]
+        return encoded
+    if id(t) in _typing_names and getattr(typing, _typing_names[id(t)]) is t:
+        return {'typing': _typing_names[id(t)]}
+    raise IRError(f'Can\'t serialize annotation {t!r}')
+
+
+class _TypeDecoder:
+    """Decodes the type references of one IR file. Equal references decode to the same object"""
+    def __init__(self):
+        self._classes = {}
+        self._type_vars = {}
+
+    def type(self, encoded) -> Any:
+        if encoded is None or isinstance(encoded, str):
+            return encoded
+        if 'typing' in encoded:
+            return getattr(typing, encoded['typing'])
+        if 'ellipsis' in encoded:
+            return Ellipsis
+        if 'typevar' in encoded:
+            return self._type_vars.setdefault(encoded['typevar'], TypeVar(encoded['typevar']))
+        if 'forward' in encoded:
+            return _ForwardRef(encoded['forward'])
+        if 'origin' in encoded:
+            origin, args = self.type(encoded['origin']), tuple(self.type(x) for x in encoded['args'])
+            if origin is typing.Callable:
+                return origin[args[0] if args[0] is Ellipsis else list(args[:-1]), args[-1]]
+            return origin[args if len(args) > 1 else args[0]]
+        if 'class' in encoded:
+            return self._class(encoded['class'], encoded['module'], [self.type(x) for x in encoded.get('parameters', [])])
+        raise IRError(f'Invalid type reference {encoded!r}')
+
+    def _class(self, qualname: str, module: str, parameters: list) -> type:
+        if module in RESOLVABLE_MODULES:
+            resolved = RESOLVABLE_MODULES[module]
+            for name in qualname.split('.'):
+                resolved = resolved.get(name) if isinstance(resolved, dict) else getattr(resolved, name, None)
+            if resolved is not None:
+                return resolved
+        key = (module, qualname)
+        if key not in self._classes:
+            namespace = {'__module__': module, '__qualname__': qualname}
+            name = qualname.split('.')[-1]
+            self._classes[key] = GenericMeta(name, (typing.Generic[tuple(parameters)],), namespace) if parameters else type(name, (), namespace)
+        return self._classes[key]
+
+    def var(self, encoded: dict) -> NameAndType:
+        return NameAndType(
+            name=encoded['name'],
+            type=self.type(encoded['type']),
+            default_value=_decode_value(encoded['default']) if 'default' in encoded else inspect.Parameter.empty,
+            keyword=encoded.get('keyword', False),
+        )
+
+    def function(self, encoded: dict) -> Function:
+        return Function(
+            name=encoded['name'],
+            args=[self.var(x) for x in encoded['args']],
+            cls=encoded['cls'],
+            return_type=self.type(encoded['return_type']),
+            batch=encoded.get('batch', False),
+        )
+
+    def swift_class(self, encoded: dict) -> SwiftClass:
+        return SwiftClass(
+            object_name=encoded['object_name'],
+            module=encoded['module'],
+            static_vars=[self.var(x) for x in encoded['static_vars']],
+            instance_vars=[self.var(x) for x in encoded['instance_vars']],
+            init_params=[[self.var(x) for x in params] for params in encoded['init_params']],
+            methods=[self.function(x) for x in encoded['methods']],
+            magic_methods=MagicMethods(**{k: self._magic_method(v) for k, v in encoded['magic_methods'].items()}),
+            positional_args=encoded.get('positional_args', False),
+            generic=self.type(encoded.get('generic')),
+        )
+
+    def _magic_method(self, encoded) -> Any:
+        if isinstance(encoded, bool):
+            return encoded
+        encoded = dict(encoded)
+        kind = encoded.pop('kind')
+        if kind == 'binary':
+            return BinaryMagicMethod(right_classes=[(self.type(rhs), self.type(ret)) for rhs, ret in encoded.pop('right_classes')], **encoded)
+        elif kind == 'unary':
+            return UnaryMagicMethod(**encoded)
+        elif kind == 'literal':
+            return ExpressibleByLiteralProtocol(**encoded)
+        elif kind == 'namespace':
+            return SimpleNamespace(**{k: self.type(v) for k, v in encoded.items()})
+        raise IRError(f'Invalid magic method {kind!r}')
+
+
+def _encode_value(value) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return {'expression': str(value)}
+
+
+def _decode_value(encoded) -> Any:
+    return Expression(encoded['expression']) if isinstance(encoded, dict) else encoded
+
+
+def _encode_var(var: NameAndType) -> dict:
+    encoded = {'name': var.name, 'type': encode_type(var.type)}
+    if var.default_value is not inspect.Parameter.empty:
+        encoded['default'] = _encode_value(var.default_value)
+    if var.keyword:
+        encoded['keyword'] = True
+    return encoded
+
+
+def _encode_function(function: Function) -> dict:
+    encoded = {
+        'name': function.name,
+        'args': [_encode_var(x) for x in function.args],
+        'cls': function.cls,
+        'return_type': encode_type(function.return_type),
+    }
+    if function.batch:
+        encoded['batch'] = True
+    return encoded
+
+
+def _encode_class(cls: SwiftClass) -> dict:
+    encoded = {
+        'object_name': cls.object_name,
+        'module': cls.module,
+        'static_vars': [_encode_var(x) for x in cls.static_vars],
+        'instance_vars': [_encode_var(x) for x in cls.instance_vars],
+        'init_params': [[_encode_var(x) for x in params] for params in cls.init_params],
+        'methods': [_encode_function(x) for x in cls.methods],
+        'magic_methods': {k: _encode_magic_method(v) for k, v in cls.magic_methods._asdict().items() if v is not False},
+        'generic': encode_type(cls.generic),
+    }
+    if cls.positional_args:
+        encoded['positional_args'] = True
+    return encoded
+
+
+def _encode_magic_method(value) -> Any:
+    if isinstance(value, bool):
+        return value
+    elif isinstance(value, BinaryMagicMethod):
+        return dict(value._asdict(), kind='binary', right_classes=[[encode_type(rhs), encode_type(ret)] for rhs, ret in value.right_classes])
+    elif isinstance(value, UnaryMagicMethod):
+        return dict(value._asdict(), kind='unary')
+    elif isinstance(value, ExpressibleByLiteralProtocol):
+        return dict(value._asdict(), kind='literal')
+    elif isinstance(value, SimpleNamespace):
+        return dict({k: encode_type(v) for k, v in vars(value).items()}, kind='namespace')
+    raise IRError(f'Can\'t serialize magic method {value!r}')
@@ -0,0 +1,269 @@
+"""
+Files the generated code is written to. By default each module is a single <swift module>.swift file in the target dir.
+
+With a shard size, the classes, magic method extensions and module class of a module are spread over
+<swift module>.swift, <swift module>.1.swift, <swift module>.2.swift... of about shard size bytes each, so that the
+Swift compiler can type check them in parallel and only rebuilds the files that changed. A declaration larger than
+the budget gets a file of its own.
+
+With a Swift package name, the target dir becomes a Swift package with one target per python module:
+
+    Package.swift
+    Sources/TypedPython/typed_python.swift  runtime shared by every target (TPobject, TPBuffer...)
+    Sources/TPython_<module>/               wrappers of each module, sharded or not
+    Sources/<package>/TPython.swift         library target re-exporting every module, with the TPython.import index
+
+Declarations are public and each file imports the targets defining the wrappers it uses. Targets can't depend on
+each other in a cycle, so modules that use each other's classes share a single target.
+"""
+import re
+from pathlib import Path
+from typing import Optional, Iterator, Iterable, List, Dict, Set, NamedTuple, Tuple
+
+from swift_python_wrapper.manifest import write_if_changed
+from swift_python_wrapper.rendering import SwiftModule, _render, set_public_access
+
+RUNTIME_TARGET = 'TypedPython'
+RUNTIME_IMPORTS = ['PythonKit', RUNTIME_TARGET]
+PYTHONKIT_URL = 'https://github.com/pvieito/PythonKit.git'
+
+_DEFINITION = re.compile(r'^(?:public\s+|fileprivate\s+)?(?:struct|class|enum)\s+(TP\w+)', re.MULTILINE)
+_REFERENCE = re.compile(r'\bTP\w+')
+_IMPORT = re.compile(r'import (\w+)\n')
+
+_shard_size: Optional[int] = None
+_swift_package: Optional[str] = None
+
+
+class LayoutError(Exception):
+    def __init__(self, message: str, modules: List[str]):
+        super().__init__(message)
+        self.modules = modules  # Modules that can't be laid out
+
+
+class SwiftTarget(NamedTuple):
+    name: str
+    modules: List[str]  # Python modules whose wrappers the target holds
+    dependencies: List[str]  # Targets besides the runtime one
+
+    @property
+    def sources(self) -> List[str]:
+        """Directories of a target shared by several modules, relative to Sources"""
+        return [module_target(x) for x in self.modules] if len(self.modules) > 1 else []
+
+
+def set_output_layout(shard_size: Optional[int] = None, swift_package: Optional[str] = None):
+    """Shard modules into files of about shard_size bytes, and/or write a Swift package named swift_package"""
+    global _shard_size, _swift_package
+    if swift_package is not None and (not swift_package.isidentifier() or swift_package == RUNTIME_TARGET or
+                                      swift_package.startswith('TPython_')):
+        raise ValueError(f'Invalid Swift package name {swift_package!r}, it must be an identifier other than '
+                         f'{RUNTIME_TARGET} that doesn\'t start with TPython_')
+    _shard_size = shard_size
+    _swift_package = swift_package
+    set_public_access(swift_package is not None)
+
+
+def shard_size() -> Optional[int]:
+    return _shard_size
+
+
+def swift_package() -> Optional[str]:
+    return _swift_package
+
+
+def module_target(module_name: str) -> str:
+    return f'TPython_{module_name.replace(".", "_")}'
+
+
+def module_dir(target_dir: str, module_name: str) -> Path:
+    return Path(target_dir) / 'Sources' / module_target(module_name) if _swift_package else Path(target_dir)
+
+
+def shard_path(directory: Path, swift_module_name: str, index: int) -> Path:
+    return directory / (f'{swift_module_name}.swift' if index == 0 else f'{swift_module_name}.{index}.swift')
+
+
+def module_files(directory: Path, swift_module_name: str) -> Iterator[Path]:
+    """Files holding a module's wrappers, its main file first"""
+    index = 0
+    while shard_path(directory, swift_module_name, index).exists():
+        yield shard_path(directory, swift_module_name, index)
+        index += 1
+
+
+def remove_stale_shards(directory: Path, swift_module_name: str, count: int):
+    """Deletes the shards past the first count left by a previous run that sharded the module into more files"""
+    while shard_path(directory, swift_module_name, count).exists():
+        shard_path(directory, swift_module_name, count).unlink()
+        count += 1
+
+
+def write_module_files(module: SwiftModule, target_dir: str, fragments: Iterable[str]) -> Tuple[str, str]:
+    """
+    Streams the module's declarations, its fragments, into shards, each written once it's full. Returns the main file,
+    relative to target_dir, and its hash.
+    """
+    directory = module_dir(target_dir, module.module_name)
+    directory.mkdir(parents=True, exist_ok=True)
+    main_path = shard_path(directory, module.swift_module_name, 0)
+    # The imports of a package target are only known once every module is written, see write_swift_package.
+    # Until then the previous ones are kept, which are usually still right and leave the file untouched
+    header = _header(_read_imports(main_path) if main_path.exists() else RUNTIME_IMPORTS) if _swift_package else _header(['PythonKit'])
+    hashes = []
+    for index, shard in enumerate(_shards(fragments, _shard_size)):
+        hashes.append(write_if_changed(shard_path(directory, module.swift_module_name, index), header + '\n'.join(shard)))
+    remove_stale_shards(directory, module.swift_module_name, len(hashes))
+    return str(main_path.relative_to(target_dir)), hashes[0]
+
+
+def write_swift_package(target_dir: str, index_modules: List[SwiftModule], index_code: str) -> Dict[str, str]:
+    """
+    Writes Package.swift, the runtime and the library target of the package holding index_modules, with index_code
+    as the TPython.import index, and fixes the imports of the module files whose dependencies changed. Returns the
+    new hash of each main file it rewrote, by module name. Raises LayoutError if modules define the same wrapper.
+    """
+    modules = {x.module_name: x.swift_module_name for x in index_modules}
+    definitions, references = scan_definitions(target_dir, index_modules)
+    dependencies = {
+        name: {definitions[x] for x in names if x in definitions and definitions[x] != name}
+        for name, names in references.items()
+    }
+    targets = _swift_targets(dependencies)
+
+    rewritten = {}
+    for target in targets:
+        header = _header(RUNTIME_IMPORTS + target.dependencies)
+        for name in target.modules:
+            for index, path in enumerate(module_files(module_dir(target_dir, name), modules[name])):
+                current_header = _header(_read_imports(path))
+                if current_header != header:
+                    content_hash = write_if_changed(path, header + path.read_text()[len(current_header):])
+                    if index == 0:
+                        rewritten[name] = content_hash
+
+    sources = Path(target_dir) / 'Sources'
+    (sources / RUNTIME_TARGET).mkdir(parents=True, exist_ok=True)
+    write_if_changed(sources / RUNTIME_TARGET / 'typed_python.swift', _render('typed_python.swift.j2', {'part': 'runtime'}))
+    (sources / _swift_package).mkdir(parents=True, exist_ok=True)
+    exports = ''.join(f'@_exported import {x}\n' for x in [RUNTIME_TARGET] + [x.name for x in targets])
+    write_if_changed(sources / _swift_package / 'TPython.swift', exports + '\n' + index_code)
+    write_if_changed(Path(target_dir) / 'Package.swift', _render('package.swift.j2', {
+        'name': _swift_package,
+        'runtime_target': RUNTIME_TARGET,
+        'pythonkit_url': PYTHONKIT_URL,
+        'targets': targets,
+    }))
+    return rewritten
+
+
+def scan_definitions(target_dir: str, index_modules: List[SwiftModule]) -> Tuple[Dict[str, str], Dict[str, Set[str]]]:
+    """
+    Module defining each wrapper type and the wrapper types each module references, read from their files. Raises
+    LayoutError if several modules define the same wrapper, such as the Config classes of a.b and a.c, which Swift
+    would reject as a redeclaration.
+    """
+    definitions, references, duplicates = {}, {}, {}
+    for module in index_modules:
+        name = module.module_name
+        references[name] = set()
+        for path in module_files(module_dir(target_dir, name), module.swift_module_name):
+            code = path.read_text()
+            references[name].update(_REFERENCE.findall(code))
+            for type_name in _DEFINITION.findall(code):
+                if definitions.setdefault(type_name, name) != name:
+                    duplicates.setdefault(type_name, {definitions[type_name]}).add(name)
+    if duplicates:
+        raise LayoutError('Wrappers defined by several modules: ' + ', '.join(
+            f'{type_name} ({", ".join(sorted(names))})' for type_name, names in sorted(duplicates.items())
+        ), sorted({x for names in duplicates.values() for x in names}))
+    return definitions, references
+
+
+def _header(imports: Iterable[str]) -> str:
+    return ''.join(f'import {x}\n' for x in imports) + '\n'
+
+
+def _read_imports(path: Path) -> List[str]:
+    imports = []
+    with path.open() as f:
+        for line in f:
+            match = _IMPORT.fullmatch(line)
+            if match is None:
+                break
+            imports.append(match.group(1))
+    return imports
+
+
+def _shards(fragments: Iterable[str], size: Optional[int]) -> Iterator[List[str]]:
+    """Groups fragments into lists of about size characters, all of them if size is None. Yields at least one"""
+    shard, shard_size = [], 0
+    for fragment in fragments:
+        fragment = fragment.strip('\n')
+        if not fragment:
+            continue
+        fragment += '\n'
+        if shard and size is not None and shard_size + len(fragment) > size:
+            yield shard
+            shard, shard_size = [], 0
+        shard.append(fragment)
+        shard_size += len(fragment) + 1
+    yield shard
+
+
+def _swift_targets(dependencies: Dict[str, Set[str]]) -> List[SwiftTarget]:
+    """One target per strongly connected component of the module dependencies, dependencies first"""
+    components = _strongly_connected_components(dependencies)
+    target_names = {}
+    for component in components:
+        name = module_target(component[0]) if len(component) == 1 else f'{module_target(component[0])}_Group'
+        for module in component:
+            target_names[module] = name
+    return [
+        SwiftTarget(
+            name=target_names[component[0]],
+            modules=component,
+            dependencies=sorted({target_names[d] for x in component for d in dependencies[x]} - {target_names[component[0]]}),
+        )
+        for component in components
+    ]
+
+
+def _strongly_connected_components(graph: Dict[str, Set[str]]) -> List[List[str]]:
+    """
+    Tarjan's algorithm, iterative since packages can nest deeper than the recursion limit. Components come out in
+    reverse topological order (dependencies before their dependents), each sorted by name.
+    """
+    index, lowlink, on_stack, stack, components = {}, {}, set(), [], []
+    for root in sorted(graph):
+        if root in index:
+            continue
+        work = [(root, iter(sorted(graph[root])))]
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(sorted(graph[child]))))
+                    break
+                elif child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    lowlink[work[-1][0]] = min(lowlink[work[-1][0]], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(sorted(component))
+    return components
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Dict, Any, Iterable
+
+from swift_python_wrapper.rendering import TEMPLATES_PATH
+
+GENERATOR_VERSION = '0.1'
+MANIFEST_FILE_NAME = '.swrap_manifest.json'
+
+# Modules whose code changes the generated Swift code. The CLI, watcher, IR and reports only drive or read the generation
+GENERATOR_MODULES = ['core.py', 'layout.py', 'module_index.py', 'overload_parser.py', 'rendering.py', 'static_extraction.py',
+                     'type_mapping.py']
+
+
+def hash_bytes(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def hash_file(path) -> str:
+    h = hashlib.sha256()
+    with open(str(path), 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+@lru_cache(maxsize=None)
+def generator_hash() -> str:
+    """Hash of everything besides the python source that affects the output: version, generator code and templates"""
+    h = hashlib.sha256(GENERATOR_VERSION.encode())
+    for path in sorted(Path(__file__).parent / x for x in GENERATOR_MODULES) + sorted(TEMPLATES_PATH.glob('*.j2')):
+        h.update(path.name.encode())
+        h.update(path.read_bytes())
+    return h.hexdigest()
+
+
+def settings_hash(settings: Dict[str, Any]) -> str:
+    """Generator hash combined with the generation options that change the output"""
+    return hash_bytes((generator_hash() + json.dumps(settings, sort_keys=True)).encode())
+
+
+def write_if_changed(path: Path, content: str) -> str:
+    """Write content to path unless it already holds exactly that, so unchanged files keep their mtime"""
+    return write_stream_if_changed(path, [content])
+
+
+def write_stream_if_changed(path: Path, fragments: Iterable[str]) -> str:
+    """
+    Streams fragments to a temporary file next to path, which is then atomically moved over path. Only one fragment
+    is held in memory at a time and readers never see a half written file. If path already held the same content
+    it's left untouched. Returns the hash of the content.
+    """
+    h = hashlib.sha256()
+    temp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    try:
+        with temp_path.open('wb') as f:
+            for chunk in _chunks(fragments):
+                encoded = chunk.encode()
+                h.update(encoded)
+                f.write(encoded)
+        content_hash = h.hexdigest()
+        if path.exists() and hash_file(path) == content_hash:
+            temp_path.unlink()
+        else:
+            os.replace(str(temp_path), str(path))
+    except BaseException:
+        if temp_path.exists():
+            temp_path.unlink()
+        raise
+    return content_hash
+
+
+def _chunks(fragments: Iterable[str], size: int = 1 << 16) -> Iterable[str]:
+    """Joins the many small fragments a template yields into chunks of about size characters"""
+    pending, pending_size = [], 0
+    for fragment in fragments:
+        pending.append(fragment)
+        pending_size += len(fragment)
+        if pending_size >= size:
+            yield ''.join(pending)
+            pending, pending_size = [], 0
+    if pending:
+        yield ''.join(pending)
+
+
+class ModuleRecord(NamedTuple):
+    source_hash: str
+    output_file: str
+    output_hash: str
+
+
+class Manifest:
+    def __init__(self, target_dir: str, settings: Dict[str, Any] = None, generator: str = None, modules: Dict[str, ModuleRecord] = None):
+        self.target_dir = Path(target_dir)
+        self.settings = settings or {}
+        self.generator = generator
+        self.modules = modules or {}
+
+    @property
+    def path(self) -> Path:
+        return self.target_dir / MANIFEST_FILE_NAME
+
+    @classmethod
+    def load(cls, target_dir: str, settings: Dict[str, Any] = None) -> 'Manifest':
+        path = Path(target_dir) / MANIFEST_FILE_NAME
+        try:
+            data = json.loads(path.read_text())
+            return cls(
+                target_dir,
+                settings=settings,
+                generator=data['generator'],
+                modules={k: ModuleRecord(**v) for k, v in data['modules'].items()},
+            )
+        except (OSError, ValueError, KeyError, TypeError):
+            return cls(target_dir, settings=settings)
+
+    def is_up_to_date(self, module_name: str, source_hash: str) -> bool:
+        record = self.modules.get(module_name)
+        if self.generator != settings_hash(self.settings) or record is None or record.source_hash != source_hash:
+            return False
+        output_path = self.target_dir / record.output_file
+        return output_path.exists() and hash_file(output_path) == record.output_hash
+
+    def record(self, module_name: str, source_hash: str, output_file: str, output_hash: str):
+        self.modules[module_name] = ModuleRecord(source_hash=source_hash, output_file=output_file, output_hash=output_hash)
+
+    def update_output_hash(self, module_name: str, output_hash: str):
+        """Records that the output of a module was rewritten after it was generated"""
+        if module_name in self.modules:
+            self.modules[module_name] = self.modules[module_name]._replace(output_hash=output_hash)
+
+    def prune(self, module_names):
+        module_names = set(module_names)
+        self.modules = {k: v for k, v in self.modules.items() if k in module_names}
+
+    def save(self):
+        self.generator = settings_hash(self.settings)
+        data = {
+            'generator': self.generator,
+            'modules': {k: v._asdict() for k, v in sorted(self.modules.items())},
+        }
+        write_if_changed(self.path, json.dumps(data, indent=2) + '\n')
@@ -0,0 +1,78 @@
+import ast
+import inspect
+import re
+from functools import lru_cache
+from typing import NamedTuple, List, Dict, Tuple, Iterable
+
+from swift_python_wrapper.overload_parser import collect_overloads
+from swift_python_wrapper.rendering import Function
+
+SWIFT_WRAPPER_ANNOTATION = re.compile(r'#\s*SWIFT_WRAPPER(\.\w+):\s*(\w+(?:\s*,\s*\w+)*)')
+
+
+class ClassIndex(NamedTuple):
+    name: str
+    lines: Tuple[int, int]  # First and last line of the class block, counting from 1
+    swift_wrapper_annotations: List[str]
+    overloads: List[Function]
+
+
+class ModuleIndex(NamedTuple):
+    """Everything the ORM builders need from a module's source, gathered in a single pass"""
+    module_name: str
+    classes: Dict[str, ClassIndex]
+    overloads: List[Function]
+    swift_wrapper_annotations: Dict[str, List[str]]  # By annotated name, for module functions
+
+
+def parse_swift_wrapper_annotations(lines: List[str]) -> List[str]:
+    result = []
+    for line in lines:
+        if 'SWIFT_WRAPPER' not in line:
+            continue
+        for match in SWIFT_WRAPPER_ANNOTATION.finditer(line):
+            annotated_class, protocols = match.groups()
+            result += [x.strip() for x in protocols.split(',')]
+    return result
+
+
+def parse_swift_wrapper_annotations_by_name(lines: List[str], excluded: Iterable[Tuple[int, int]] = ()) -> Dict[str, List[str]]:
+    """Annotations by annotated name, leaving out the lines in the excluded (first, last) ranges, counting from 1"""
+    result = {}
+    excluded = list(excluded)
+    for number, line in enumerate(lines, start=1):
+        if 'SWIFT_WRAPPER' not in line or any(first <= number <= last for first, last in excluded):
+            continue
+        for match in SWIFT_WRAPPER_ANNOTATION.finditer(line):
+            annotated_name, protocols = match.groups()
+            result.setdefault(annotated_name.lstrip('.'), []).extend(x.strip() for x in protocols.split(','))
+    return result
+
+
+@lru_cache(maxsize=256)
+def build_module_index(module_name: str, source: str) -> ModuleIndex:
+    tree = ast.parse(source)
+    lines = source.splitlines(keepends=True)
+    overloads = collect_overloads(tree, module_name) if 'overload' in source else {}
+    classes = {}
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            # Same block inspect.getsource returns: from the class statement (not its decorators) to its last line
+            start = node.lineno - 1
+            while not lines[start].lstrip().startswith('class'):
+                start += 1
+            block = inspect.getblock(lines[start:])
+            classes[node.name] = ClassIndex(
+                name=node.name,
+                lines=(start + 1, start + len(block)),
+                swift_wrapper_annotations=parse_swift_wrapper_annotations(block),
+                overloads=overloads.get(node.name, []),
+            )
+    return ModuleIndex(
+        module_name=module_name,
+        classes=classes,
+        overloads=overloads.get(None, []),
+        # Annotations inside a class are the class's, not those of a module function of the same name
+        swift_wrapper_annotations=parse_swift_wrapper_annotations_by_name(lines, [x.lines for x in classes.values()])
+        if 'SWIFT_WRAPPER' in source else {},
+    )
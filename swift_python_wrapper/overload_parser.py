@@ -1,143 +1,101 @@
-from typing import Tuple, List
+import ast
+import inspect
+import textwrap
+import typing
+from functools import lru_cache
+from typing import List, Dict, Optional
 
 from swift_python_wrapper.rendering import NameAndType, Function
-
-
-def parse_overloads(source: str, indentation: int, module_or_class_name: str):
-    overloads = [
-        a_def(module_or_class_name, x.lstrip())
-        for x in source.split('@overload\n')[1:]
-        if x.startswith(('    ' * indentation) + 'def')
-    ]
-    return overloads
-
-
-def get_tk(source: str, i):
+from swift_python_wrapper.static_extraction import AnnotationResolver, literal_value
+
+
+def parse_overloads(source: str, indentation: int, module_or_class_name: str) -> List[Function]:
+    """Overloaded functions in source, module functions if indentation is 0 and methods if it's 1"""
+    overloads = parse_module_overloads(textwrap.dedent(source), module_or_class_name)
+    if indentation == 0:
+        return overloads.get(None, [])
+    return [f._replace(cls=module_or_class_name) for class_name, functions in overloads.items() if class_name is not None for f in functions]
+
+
+@lru_cache(maxsize=None)
+def parse_module_overloads(source: str, module_name: str) -> Dict[Optional[str], List[Function]]:
+    """
+    Parses every @overload group of a module in a single pass over its syntax tree.
+    Returns the overloads by class name, module functions under None.
+    """
+    if 'overload' not in source:
+        return {}
+    return collect_overloads(ast.parse(source), module_name)
+
+
+def collect_overloads(tree: ast.Module, module_name: str) -> Dict[Optional[str], List[Function]]:
+    """Same as parse_module_overloads for an already parsed module"""
+    resolver = OverloadTypeResolver(module_name)
+    result = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    try:
+                        resolver.namespace[target.id] = resolver.resolve(node.value)
+                    except ValueError:
+                        pass
+        elif isinstance(node, ast.FunctionDef) and is_overload(node):
+            result.setdefault(None, []).append(overload_function(node, module_name, resolver))
+        elif isinstance(node, ast.ClassDef):
+            methods = [overload_function(x, node.name, resolver) for x in node.body if isinstance(x, ast.FunctionDef) and is_overload(x)]
+            if methods:
+                result.setdefault(node.name, []).extend(methods)
+    return result
+
+
+class OverloadTypeResolver(AnnotationResolver):
+    """Resolves types against typing and builtins. Quoted types are resolved as if they weren't quoted"""
+    def __init__(self, module_name: str):
+        super().__init__(module_name)
+        self.namespace = {k: v for k, v in vars(typing).items() if not k.startswith('_')}
+
+    def resolve(self, node: ast.AST, local_namespace: Optional[dict] = None):
+        if isinstance(node, ast.Str):
+            try:
+                return self.resolve(ast.parse(node.s, mode='eval').body, local_namespace)
+            except SyntaxError:
+                return node.s
+        return super().resolve(node, local_namespace)
+
+
+def is_overload(node: ast.FunctionDef) -> bool:
+    return any(
+        (isinstance(x, ast.Name) and x.id == 'overload') or (isinstance(x, ast.Attribute) and x.attr == 'overload')
+        for x in node.decorator_list
+    )
+
+
+def overload_function(node: ast.FunctionDef, cls: str, resolver: OverloadTypeResolver) -> Function:
+    args = node.args
+    defaults = [None] * (len(args.args) - len(args.defaults)) + args.defaults
+    params = [(x, d, False) for x, d in zip(args.args, defaults)] + \
+        ([(args.vararg, None, True)] if args.vararg else []) + \
+        [(x, d, True) for x, d in zip(args.kwonlyargs, args.kw_defaults)] + \
+        ([(args.kwarg, None, True)] if args.kwarg else [])
+    return Function(
+        name=node.name,
+        args=[
+            NameAndType(
+                name=arg.arg,
+                type=resolver.resolve_annotation(arg.annotation),
+                default_value=inspect.Parameter.empty if default is None else _default_value(default),
+                keyword=keyword,
+            )
+            for arg, default, keyword in params if arg.arg != 'self'
+        ],
+        cls=cls,
+        return_type=resolver.resolve_annotation(node.returns) if node.returns is not None else None,
+    )
+
+
+def _default_value(node: ast.AST):
     try:
-        return source[i]
-    except IndexError:
-        return None
-
-
-class ParseError(Exception):
-    pass
-
-
-WHITESPACE_TOKENS = [' ', '\t', '\n']
-
-
-def a_whitespace(source: str, i: int, optional: bool = False) -> int:
-    tk = get_tk(source, i)
-    if not optional and tk not in WHITESPACE_TOKENS:
-        raise ParseError(f'Expected whitespace, found {tk}')
-    while tk in WHITESPACE_TOKENS:
-        i += 1
-        tk = get_tk(source, i)
-    return i
-
-
-def a_str(source: str, i: int, s: str) -> int:
-    for c in s:
-        tk = get_tk(source, i)
-        if tk != c:
-            raise ParseError(f'Attempting to parse "{s}". Expected "{c}", found "{tk}" in source:\n{source}')
-        i += 1
-    return i
-
-
-def a_id(source: str, i: int) -> Tuple[str, int]:
-    start = i
-    tk = get_tk(source, i)
-    if not tk.isalpha() and tk != '_':
-        raise ParseError(f'Char "{tk}" not allowed as first character in identifier. Parsing:\n{source}')
-    i += 1
-    tk = get_tk(source, i)
-    while tk == '_' or tk.isalnum() and tk != '_':
-        i += 1
-        tk = get_tk(source, i)
-    return source[start:i], i
-
-
-def a_get_type(source: str, i: int) -> Tuple[type, int]:
-    start = i
-    if get_tk(source, i) == "'":
-        i += 1
-        t, i = a_get_type(source, i)
-        i = a_str(source, i, "'")
-        # i += 1
-        # identifier, i = a_id(source, i)
-        # i = a_str(source, i, "'")
-    else:
-        identifier, i = a_id(source, i)
-
-    if get_tk(source, i) == '[':
-        i += 1
-        i = a_whitespace(source, i, optional=True)
-        t, i = a_get_type(source, i)
-        i = a_whitespace(source, i, optional=True)
-        while get_tk(source, i) == ',':
-            i += 1
-            i = a_whitespace(source, i, optional=True)
-            t, i = a_get_type(source, i)
-            i = a_whitespace(source, i, optional=True)
-        tk = get_tk(source, i)
-        if tk != ']':
-            raise ParseError(f'Expected "]", found {tk}')
-        i += 1
-    return eval(source[start:i].replace("'", '')), i
-
-
-def a_typed_param(source: str, i: int) -> Tuple[NameAndType, int]:
-    identifier, i = a_id(source, i)
-    i = a_whitespace(source, i, optional=True)
-    i = a_str(source, i, ':')
-    i = a_whitespace(source, i, optional=True)
-    t, i = a_get_type(source, i)
-    i = a_whitespace(source, i, optional=True)
-    return NameAndType(name=identifier, type=t), i
-
-
-def a_typed_params(source: str, i: int) -> Tuple[List[NameAndType], int]:
-    result = []
-    if source[i:i+len('self')] == 'self':
-        i += len('self')
-        i = a_whitespace(source, i, optional=True)
-        i = a_str(source, i, ',')
-        i = a_whitespace(source, i, optional=True)
-
-    tp, i = a_typed_param(source, i)
-    result.append(tp)
-    while get_tk(source, i) == ',':
-        i += 1
-        i = a_whitespace(source, i, optional=True)
-        tp, i = a_typed_param(source, i)
-        result.append(tp)
-    return result, i
-
-
-def a_def(class_name, source: str) -> Function:
-    i = a_whitespace(source, 0, optional=True)
-    i = a_str(source, i, 'def')
-    i = a_whitespace(source, i)
-    name, i = a_id(source, i)
-    i = a_whitespace(source, i, optional=True)
-    i = a_str(source, i, '(')
-    i = a_whitespace(source, i, optional=True)
-    name_types, i = a_typed_params(source, i)
-    i = a_str(source, i, ')')
-    i = a_whitespace(source, i, optional=True)
-    if get_tk(source, i) == '-':
-        i += 1
-        tk = get_tk(source, i)
-        if tk != '>':
-            raise ParseError(f'Error while parsing -> found {tk}')
-        i += 1
-        i = a_whitespace(source, i, optional=True)
-        return_type, i = a_get_type(source, i)
-        i = a_whitespace(source, i, optional=True)
-    else:
-        return_type = None
-    i = a_str(source, i, ':')
-    i = a_whitespace(source, i, optional=True)
-    i = a_str(source, i, '...')
-    return Function(name=name, args=name_types, cls=class_name, return_type=return_type)
+        return literal_value(node)
+    except ValueError:
+        return Ellipsis
@@ -0,0 +1,180 @@
+"""
+Wall time, call counts and peak memory of each phase of a generation run, per module and per class, recorded when
+generate runs with --profile. Phases nest (classes are extracted during the extract phase of their module) and a
+phase's time and memory include those of the phases nested in it.
+
+Memory is measured with tracemalloc. On python < 3.9, which can't reset its peak, the peak of a phase is exact when
+the phase raises the peak of the whole run and is the memory it still holds when it ends otherwise.
+"""
+import platform
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import NamedTuple, Dict, Tuple, Optional, List, Iterable, Iterator
+
+_reset_peak = getattr(tracemalloc, 'reset_peak', None)
+
+
+class PhaseStats(NamedTuple):
+    calls: int = 0
+    seconds: float = 0
+    peak_memory: int = 0  # Bytes
+
+
+class Profiler:
+    def __init__(self):
+        self.stats: Dict[Tuple[str, str, str], PhaseStats] = {}  # By phase, module and class
+        self._frames = []
+        self.peak_memory = 0  # Of the whole run
+
+    def phase(self, name: str, module: Optional[str] = None, cls: Optional[str] = None) -> '_Phase':
+        """Context manager recording a call of phase name. Module and class default to those of the enclosing phase"""
+        return _Phase(self, name, module, cls)
+
+    def iterate(self, name: str, iterable: Iterable) -> Iterator:
+        """Yields from iterable as a single call of phase name, which only times producing the items"""
+        with self.phase(name) as frame:
+            iterator = iter(iterable)
+            frame.seconds = 0
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    frame.seconds += time.perf_counter() - start
+                yield item
+
+    def _enter(self, name: str, module: Optional[str], cls: Optional[str]) -> SimpleNamespace:
+        parent = self._frames[-1] if self._frames else SimpleNamespace(module='', cls='')
+        if module is None:
+            module, cls = parent.module, parent.cls if cls is None else cls
+        self._record_peak()
+        if _reset_peak is not None:
+            _reset_peak()
+        current, peak = tracemalloc.get_traced_memory()
+        frame = SimpleNamespace(name=name, module=module, cls=cls or '', base=current, peak_at_start=peak, peak=None, seconds=None)
+        self._frames.append(frame)
+        frame.start = time.perf_counter()
+        return frame
+
+    def _exit(self, frame: SimpleNamespace):
+        seconds = time.perf_counter() - frame.start if frame.seconds is None else frame.seconds
+        self._record_peak()
+        self._frames.remove(frame)
+        current, _ = tracemalloc.get_traced_memory()
+        peak = frame.peak if frame.peak is not None else max(current - frame.base, 0)
+        key = (frame.name, frame.module, frame.cls)
+        stats = self.stats.get(key, PhaseStats())
+        self.stats[key] = PhaseStats(stats.calls + 1, stats.seconds + seconds, max(stats.peak_memory, peak))
+
+    def _record_peak(self):
+        _, peak = tracemalloc.get_traced_memory()
+        self.peak_memory = max(self.peak_memory, peak)
+        for frame in self._frames:
+            if _reset_peak is not None or peak > frame.peak_at_start:
+                frame.peak = max(frame.peak or 0, peak - frame.base)
+
+    def report(self) -> dict:
+        return {
+            'python': platform.python_version(),
+            'exact_peak_memory': _reset_peak is not None,
+            'peak_memory': self.peak_memory,
+            'phases': _stats_dict(_aggregate(self.stats, lambda name, module, cls: name)),
+            'modules': _nested_stats_dict(_aggregate(self.stats, lambda name, module, cls: (module, name) if module else None)),
+            'classes': _nested_stats_dict(_aggregate(self.stats, lambda name, module, cls: (f'{module}.{cls}', name) if cls else None)),
+        }
+
+    def summary(self, top: int = 10) -> str:
+        """Human readable report of the phases and of the top slowest modules and classes"""
+        report = self.report()
+        lines = ['Phases:']
+        for name, stats in _slowest(report['phases'], top=None):
+            lines.append(f'  {name:<16} {stats["calls"]:>7} calls {stats["seconds"]:>9.3f} s   peak {_mib(stats["peak_memory"])}')
+        for title, key, phase in [('modules', 'modules', 'module'), ('classes', 'classes', 'class')]:
+            totals = {name: phases[phase] for name, phases in report[key].items() if phase in phases}
+            if totals:
+                lines.append(f'Slowest {title}:')
+            for name, stats in _slowest(totals, top):
+                details = ', '.join(f'{x} {s["seconds"]:.3f} s' for x, s in report[key][name].items() if x != phase)
+                lines.append(f'  {name:<32} {stats["seconds"]:>9.3f} s   peak {_mib(stats["peak_memory"])}' + (f'   ({details})' if details else ''))
+        return '\n'.join(lines)
+
+
+class _Phase:
+    def __init__(self, profiler: Profiler, name: str, module: Optional[str], cls: Optional[str]):
+        self.profiler, self.name, self.module, self.cls = profiler, name, module, cls
+
+    def __enter__(self) -> SimpleNamespace:
+        self.frame = self.profiler._enter(self.name, self.module, self.cls)
+        return self.frame
+
+    def __exit__(self, *exc_info):
+        self.profiler._exit(self.frame)
+
+
+class _NoPhase:
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NO_PHASE = _NoPhase()
+_profiler: Optional[Profiler] = None
+
+
+def start_profiling() -> Profiler:
+    global _profiler
+    tracemalloc.start()
+    _profiler = Profiler()
+    return _profiler
+
+
+def stop_profiling() -> Optional[Profiler]:
+    global _profiler
+    profiler, _profiler = _profiler, None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return profiler
+
+
+def phase(name: str, module: Optional[str] = None, cls: Optional[str] = None):
+    """Records a call of phase name while profiling, does nothing otherwise"""
+    return _profiler.phase(name, module, cls) if _profiler is not None else _NO_PHASE
+
+
+def profiled(name: str, iterable: Iterable) -> Iterable:
+    return _profiler.iterate(name, iterable) if _profiler is not None else iterable
+
+
+def _aggregate(stats: Dict[Tuple[str, str, str], PhaseStats], key) -> Dict:
+    aggregated = {}
+    for (name, module, cls), x in stats.items():
+        k = key(name, module, cls)
+        if k is None:
+            continue
+        total = aggregated.get(k, PhaseStats())
+        aggregated[k] = PhaseStats(total.calls + x.calls, total.seconds + x.seconds, max(total.peak_memory, x.peak_memory))
+    return aggregated
+
+
+def _stats_dict(stats: Dict[str, PhaseStats]) -> Dict[str, dict]:
+    return {name: dict(x._asdict()) for name, x in stats.items()}
+
+
+def _nested_stats_dict(stats: Dict[Tuple[str, str], PhaseStats]) -> Dict[str, Dict[str, dict]]:
+    nested = {}
+    for (outer, name), x in stats.items():
+        nested.setdefault(outer, {})[name] = dict(x._asdict())
+    return nested
+
+
+def _slowest(stats: Dict[str, dict], top: Optional[int]) -> List[Tuple[str, dict]]:
+    return sorted(stats.items(), key=lambda x: x[1]['seconds'], reverse=True)[:top]
+
+
+def _mib(size: int) -> str:
+    return f'{size / 2 ** 20:.1f} MiB'
@@ -1,15 +1,27 @@
 import inspect
-import re
 from pathlib import Path
-from typing import NamedTuple, List, Optional, Any, Union, _ForwardRef, Tuple, Sequence, Generic, TypeVar, GenericMeta
+from typing import NamedTuple, List, Optional, Any, Union, Tuple, TypeVar, Iterator
 
 import jinja2 as jinja2
 
+from swift_python_wrapper.type_mapping import convert_to_swift_type as _convert_to_swift_type, convert_from_python
+
+
+# Swift types scalars are copied into by snapshot(), so that reading a field doesn't go back into python
+SCALAR_VALUE_TYPES = {int: 'Int', float: 'Double', str: 'String', bool: 'Bool'}
+
+
+def tuple_from_python(types, value: str) -> str:
+    """Swift expression converting the python tuple value to a tuple of types, unpacked from a single .tupleN"""
+    converted = [convert_from_python(_convert_to_swift_type(x), f'$0.{i}') for i, x in enumerate(types)]
+    return f'{{ ({", ".join(converted)}) }}({value}.tuple{len(types)})'
+
 
 class NameAndType(NamedTuple):
     name: str
     type: Optional[type]
     default_value: Any = inspect.Parameter.empty
+    keyword: bool = False  # Passed by keyword in calls to python rather than by position
 
     @property
     def mapped_default_value(self):
@@ -38,15 +50,26 @@ class NameAndType(NamedTuple):
             return f'{self.name}.wrappedInstance'
 
     def _wrapped_return(self, wrapped: str) -> str:
+        return self.from_python(f'{wrapped}[dynamicMember: "{self.name}"]')
+
+    def from_python(self, value: str) -> str:
+        """Swift expression converting the PythonObject expression value to this var's type"""
         if self.type.__class__ == type(Tuple):
-            n = len(self.type.__args__)
-            converted = [f'{_convert_to_swift_type(x)}({wrapped}[dynamicMember: "{self.name}"].tuple{n}.{i})' for i, x in enumerate(self.type.__args__)]
-            wrapped = f'({", ".join(converted)})'
-            return wrapped
+            return tuple_from_python(self.type.__args__, value)
         # elif self.type == bool:
-        #     return f'Bool({wrapped}[dynamicMember: "{self.name}"])!'
+        #     return f'Bool({value})!'
         else:
-            return f'{self.mapped_type}({wrapped}[dynamicMember: "{self.name}"])'
+            return convert_from_python(self.mapped_type, value)
+
+    @property
+    def value_type(self) -> str:
+        """Swift type of the var in a snapshot: a native value for scalars, the mapped type otherwise"""
+        return SCALAR_VALUE_TYPES.get(self.type, self.mapped_type)
+
+    def value_from_python(self, value: str) -> str:
+        if self.type in SCALAR_VALUE_TYPES:
+            return f'{SCALAR_VALUE_TYPES[self.type]}({value})!'
+        return self.from_python(value)
 
     @property
     def wrapped_return(self):
@@ -66,6 +89,7 @@ class Function(NamedTuple):
     args: List[NameAndType]
     cls: str
     return_type: Optional[type] = None
+    batch: bool = False  # Also generate a name(batch:) variant that loops inside python
 
     @property
     def mapped_return_type(self):
@@ -82,6 +106,11 @@ class Function(NamedTuple):
         type_vars = [x.type for x in self.args if x.type.__class__ == TypeVar]
         return f'<{", ".join([f"{x.__name__}: TPobject" for x in type_vars])}>' if type_vars != [] else ''
 
+    @property
+    def handle_name(self) -> str:
+        """Generated Swift constant caching the python callable, so calls skip the attribute lookup"""
+        return f'_py_{self.name}'
+
     @property
     def static_method(self):
         return self.cls == 'staticmethod'
@@ -97,15 +126,13 @@ class Function(NamedTuple):
     @property
     def wrapped_return(self) -> str:
         if self.return_type.__class__ == type(Tuple):
-            converted = [f'{_convert_to_swift_type(x)}(val.{i})' for i, x in enumerate(self.return_type.__args__)]
-            wrapped = f'({", ".join(converted)})'
-            return wrapped
+            return tuple_from_python(self.return_type.__args__, 'val')
         # elif self.return_type == bool:
         #     return 'Bool(val)!'
         elif self.return_type.__class__ == TypeVar:
             return f'{self.mapped_return_type}.init(val)'
         else:
-            return f'{self.mapped_return_type}(val)'
+            return convert_from_python(self.mapped_return_type, 'val')
 
 
 class SwiftClass(NamedTuple):
@@ -127,13 +154,39 @@ class SwiftClass(NamedTuple):
     def python_module_name(self):
         return self.module.replace('.stub', '')
 
+    @property
+    def handles_name(self) -> str:
+        """
+        Swift type holding the cached class and method handles. Generic types can't have static stored properties,
+        so theirs live in a separate enum shared by all specializations.
+        """
+        return self.swift_object_name if self.generic is None else f'_{self.swift_object_name}Handles'
+
+    @property
+    def snapshot_fields(self) -> List[NameAndType]:
+        """Typed instance vars, fetched by the generated snapshot() in a single call. Empty if snapshot is taken"""
+        if any(x.name == 'snapshot' for x in self.methods + self.instance_vars + self.static_vars):
+            return []
+        fields = {}
+        for var in self.instance_vars:
+            if var.type is not None:
+                fields.setdefault(var.name, var)
+        return list(fields.values())
+
     @property
     def type_vars(self) -> Optional[List[str]]:
         return None if self.generic is None else self.generic.__parameters__
 
     @property
     def as_dict(self):
-        return dict(swift_object_name=self.swift_object_name, python_module_name=self.python_module_name, **self._asdict())
+        return dict(
+            swift_object_name=self.swift_object_name,
+            python_module_name=self.python_module_name,
+            handles_name=self.handles_name,
+            qualified_name=f'{self.python_module_name}.{self.object_name}',
+            snapshot_fields=self.snapshot_fields,
+            **self._asdict(),
+        )
 
     def render_type_vars(self):
         if self.generic is not None:
@@ -144,14 +197,23 @@ class SwiftClass(NamedTuple):
     def render_magic_methods(self):
         return _render('magic_methods.swift.j2', self.as_dict)
 
-    def render(self):
+    def render(self, magic_methods: bool = True):
         return _render('object.swift.j2', dict(
-            rendered_magic_methods=self.render_magic_methods(),
+            rendered_magic_methods=self.render_magic_methods() if magic_methods else '',
             type_vars=self.type_vars,
             rendered_type_vars=self.render_type_vars(),
             **self.as_dict,
         ))
 
+    def fragments(self) -> List[str]:
+        """
+        Declarations of the class and of its magic method extensions, which can go to different files. Extensions of
+        generic classes stay with their class, which they share fileprivate handles with.
+        """
+        if self.generic is not None:
+            return [self.render()]
+        return [self.render(magic_methods=False), self.render_magic_methods()]
+
 
 class SwiftModule(NamedTuple):
     module_name: str
@@ -174,35 +236,15 @@ class SwiftModule(NamedTuple):
     def render(self):
         return _render('module.swift.j2', self.as_dict)
 
+    def generate(self) -> Iterator[str]:
+        """Same output as render, yielded in fragments so that only one rendered class is held in memory at a time"""
+        return _generate('module.swift.j2', self.as_dict)
 
-def _convert_to_swift_type(python_type) -> str:
-    if python_type == Any or python_type == type(None) or python_type == inspect.Parameter.empty:
-        return 'TPobject'
-    elif isinstance(python_type, str) and python_type in ['T', 'V', 'G']:
-        return python_type
-    elif isinstance(python_type, str) and re.match(r'\w+\[(\w+(?:\s*,\s*\w+)*)]', python_type):
-        t, tvs = re.match(r'(\w+)\[(\w+(?:\s*,\s*\w+)*)]', python_type).groups()
-        converted_tvs = [_convert_to_swift_type(x.strip()) for x in tvs.split(',')]
-        return f'TP{t}<{", ".join(converted_tvs)}>'
-    elif isinstance(python_type, str):
-        return f'TP{python_type}'
-    elif python_type.__class__ == type(Union) and python_type.__args__[1] == type(None):
-        return _convert_to_swift_type(python_type.__args__[0]) + '?'
-    elif python_type.__class__ == TypeVar:
-        return python_type.__name__
-    elif python_type.__class__ == type(Tuple):
-        args = [_convert_to_swift_type(x) for x in python_type.__args__]
-        return f'({", ".join(args)})'
-    elif python_type.__class__ == GenericMeta:
-        return f'TP{python_type.__name__}<{_convert_to_swift_type(python_type.__args__[0])}>'
-    elif python_type.__class__ == type(Sequence):
-        return f'TPSequence<{_convert_to_swift_type(python_type.__args__[0])}>'
-    elif isinstance(python_type, _ForwardRef):
-        return f'TP{python_type.__forward_arg__}'
-    try:
-        return f'TP{python_type.__name__}'
-    except AttributeError:
-        raise
+    def fragments(self) -> Iterator[str]:
+        """Declarations of the classes, their magic method extensions and the module class, without imports"""
+        for cls in self.classes:
+            yield from cls.fragments()
+        yield _render('module.swift.j2', dict(module_class_only=True, **self.as_dict))
 
 
 class BinaryMagicMethod(NamedTuple):
@@ -211,12 +253,20 @@ class BinaryMagicMethod(NamedTuple):
     swift_protocol_name: Optional[str]
     right_classes: List[Tuple[type, type]]  # List of right hand side types and return types for each
 
+    @property
+    def handle_name(self) -> str:
+        return f'_py{self.python_magic_method}'
+
 
 class UnaryMagicMethod(NamedTuple):
     symbol: str
     python_magic_method: str
     swift_protocol_name: Optional[str]
 
+    @property
+    def handle_name(self) -> str:
+        return f'_py{self.python_magic_method}'
+
 
 class ExpressibleByLiteralProtocol(NamedTuple):
     protocol_name: str
@@ -268,6 +318,7 @@ class MagicMethods(NamedTuple):
     # Others
     context_manager: bool = False
     Sequence: bool = False
+    RandomAccessCollection: bool = False
     # DictLike: bool = False
     # Literal expressible protocols
     ExpressibleByIntegerLiteral: Union[bool, ExpressibleByLiteralProtocol] = False
@@ -306,17 +357,83 @@ def force_unwrap(t):
     return '!' if t == bool else ''
 
 
-def _render(template_name: str, context: dict):
-    search_path = Path(__file__).parent / 'templates'
-    template_loader = jinja2.FileSystemLoader(searchpath=str(search_path))
-    template_env = jinja2.Environment(loader=template_loader)
+TEMPLATES_PATH = Path(__file__).parent / 'templates'
+
+_template_env: Optional[jinja2.Environment] = None
+_bytecode_cache_dir: Optional[str] = None
+_instrument = False
+_public = False
+
+
+def set_bytecode_cache_dir(cache_dir: Optional[str]):
+    """Persist compiled templates in cache_dir so later runs skip template compilation. None disables it."""
+    global _template_env, _bytecode_cache_dir
+    if cache_dir is not None:
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    _bytecode_cache_dir = cache_dir
+    _template_env = None
+
+
+def bytecode_cache_dir() -> Optional[str]:
+    return _bytecode_cache_dir
+
+
+def set_instrumentation(enabled: bool):
+    """Wrap every call into python of the generated code in a TPythonMetrics measurement"""
+    global _instrument
+    _instrument = enabled
+
+
+def instrumentation() -> bool:
+    return _instrument
+
 
-    template_env.trim_blocks = True
-    template_env.lstrip_blocks = True
-    template_env.keep_trailing_newline = True
+def set_public_access(enabled: bool):
+    """Declare the generated wrappers public, so they can be used from other Swift modules"""
+    global _public
+    _public = enabled
 
-    template_env.filters.update(convert_to_swift_type=_convert_to_swift_type)
-    template_env.filters.update(force_unwrap=force_unwrap)
 
-    template = template_env.get_template(template_name)
+def access() -> str:
+    """Access modifier of the generated declarations"""
+    return 'public ' if _public else ''
+
+
+def measured(expression: str, python_name: str) -> str:
+    """Swift expression recording the calls and latency of expression under python_name, if instrumenting"""
+    if not _instrument:
+        return expression
+    # Not a trailing closure, which isn't allowed in if and guard conditions
+    return f'TPythonMetrics.measure("{python_name}", {{ {expression} }})'
+
+
+def get_template_env() -> jinja2.Environment:
+    global _template_env
+    if _template_env is None:
+        template_env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(searchpath=str(TEMPLATES_PATH)),
+            bytecode_cache=jinja2.FileSystemBytecodeCache(_bytecode_cache_dir) if _bytecode_cache_dir else None,
+        )
+
+        template_env.trim_blocks = True
+        template_env.lstrip_blocks = True
+        template_env.keep_trailing_newline = True
+
+        template_env.filters.update(convert_to_swift_type=_convert_to_swift_type)
+        template_env.filters.update(force_unwrap=force_unwrap)
+        template_env.filters.update(from_python=convert_from_python)
+        template_env.filters.update(measured=measured)
+        template_env.globals.update(instrumentation=instrumentation)
+        template_env.globals.update(access=access)
+        _template_env = template_env
+    return _template_env
+
+
+def _render(template_name: str, context: dict):
+    template = get_template_env().get_template(template_name)
     return template.render(context)
+
+
+def _generate(template_name: str, context: dict) -> Iterator[str]:
+    template = get_template_env().get_template(template_name)
+    return template.generate(context)
@@ -0,0 +1,306 @@
+"""
+Builds the ORM of a python module or stub file without importing it.
+
+The module is parsed with ast and mirrored with stand-in classes and functions that have the same names, bases,
+signatures and annotations as the original ones, but no behaviour. The regular ORM builders in core then run on the
+mirror, so both extraction modes produce the same SwiftModule. Annotations are resolved against builtins and typing;
+names imported from anywhere else become empty stand-in classes, which is enough since only their name is rendered.
+"""
+import ast
+import builtins
+import collections.abc
+import inspect
+import types
+import typing
+from pathlib import Path
+from typing import Any, List, Optional
+
+from swift_python_wrapper.profiling import phase
+from swift_python_wrapper.rendering import SwiftModule
+
+STATIC_SOURCE_ATTRIBUTE = '__static_source__'
+
+RESOLVABLE_MODULES = {
+    'typing': typing,
+    'collections.abc': collections.abc,
+}
+
+BUILTINS = vars(builtins)
+
+# Only these calls are evaluated when resolving module level assignments such as T = TypeVar('T')
+RESOLVABLE_CALLS = (typing.TypeVar, typing.NewType)
+
+
+class MirroredFunctionCallError(TypeError):
+    """Raised by the functions mirrored from a source, which only exist for inspect to read their signature"""
+
+
+class UnresolvedValue:
+    """Stand-in for a class attribute whose value is not a literal. Like most real values, it's truthy"""
+    def __repr__(self):
+        return '...'
+
+
+class UnresolvedModule:
+    """Stand-in for a module that can't be imported statically. Its attributes are stand-in classes"""
+    def __init__(self, name: str, resolver: 'AnnotationResolver'):
+        self.__name__ = name
+        self._resolver = resolver
+
+    def __getattr__(self, item):
+        if item.startswith('__'):
+            raise AttributeError(item)
+        return self._resolver.unresolved(item, module_name=self.__name__)
+
+
+class AnnotationResolver:
+    def __init__(self, module_name: str):
+        self.module_name = module_name
+        self.namespace = {}
+        self._unresolved = {}
+
+    def unresolved(self, name: str, module_name: str = '<unresolved>') -> type:
+        """Stand-in class, which keeps the module it's imported from so it can be mapped by qualified name"""
+        key = (module_name, name)
+        if key not in self._unresolved:
+            self._unresolved[key] = type(name, (), {'__module__': module_name})
+        return self._unresolved[key]
+
+    def lookup(self, name: str, local_namespace: Optional[dict] = None):
+        if local_namespace and name in local_namespace:
+            return local_namespace[name]
+        elif name in self.namespace:
+            return self.namespace[name]
+        elif name in BUILTINS:
+            return BUILTINS[name]
+        return self.unresolved(name)
+
+    def resolve(self, node: ast.AST, local_namespace: Optional[dict] = None):
+        """Evaluates a type expression without executing any code from the module"""
+        if isinstance(node, ast.Name):
+            return self.lookup(node.id, local_namespace)
+        elif isinstance(node, ast.Attribute):
+            value = self.resolve(node.value, local_namespace)
+            return getattr(value, node.attr, None) or self.unresolved(node.attr)
+        elif isinstance(node, ast.Subscript):
+            value = self.resolve(node.value, local_namespace)
+            index = node.slice.value if isinstance(node.slice, ast.Index) else node.slice
+            try:
+                return value[self.resolve(index, local_namespace)]
+            except TypeError:
+                return value
+        elif isinstance(node, ast.Tuple):
+            return tuple(self.resolve(x, local_namespace) for x in node.elts)
+        elif isinstance(node, ast.List):
+            return [self.resolve(x, local_namespace) for x in node.elts]
+        elif isinstance(node, ast.Call):
+            func = self.resolve(node.func, local_namespace)
+            if func not in RESOLVABLE_CALLS:
+                raise ValueError(f'Call to {func} is not statically resolvable')
+            return func(*[self.resolve(x, local_namespace) for x in node.args])
+        return literal_value(node)
+
+    def resolve_annotation(self, node: Optional[ast.AST], local_namespace: Optional[dict] = None):
+        if node is None:
+            return inspect.Parameter.empty
+        try:
+            return self.resolve(node, local_namespace)
+        except ValueError:
+            return self.unresolved(type(node).__name__)
+
+
+def literal_value(node: ast.AST):
+    if isinstance(node, ast.Ellipsis) or getattr(node, 'value', None) is Ellipsis:
+        return Ellipsis
+    return ast.literal_eval(node)
+
+
+def create_static_module_orm(module_name: str, module_path: str) -> SwiftModule:
+    """Same as core.create_module_orm(load_module_from_path(module_name, module_path)), but nothing gets imported"""
+    from swift_python_wrapper.core import create_module_orm
+    with phase('load'):
+        module = mirror_module(module_name, Path(module_path).read_text())
+    return create_module_orm(module)
+
+
+def mirror_module(module_name: str, source: str) -> types.ModuleType:
+    tree = ast.parse(source)
+    lines = source.splitlines(keepends=True)
+    resolver = AnnotationResolver(module_name)
+    module = types.ModuleType(module_name)
+    setattr(module, STATIC_SOURCE_ATTRIBUTE, source)
+    annotations = {}
+
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                bound_name = alias.asname or alias.name.split('.')[0]
+                imported_name = alias.name if alias.asname else bound_name
+                resolver.namespace[bound_name] = RESOLVABLE_MODULES.get(imported_name) or UnresolvedModule(imported_name, resolver)
+        elif isinstance(node, ast.ImportFrom):
+            imported_module = RESOLVABLE_MODULES.get(node.module) if node.level == 0 else None
+            for alias in node.names:
+                if alias.name == '*':
+                    continue
+                value = getattr(imported_module, alias.name, None) \
+                    or resolver.unresolved(alias.name, module_name=node.module if node.level == 0 else '<unresolved>')
+                resolver.namespace[alias.asname or alias.name] = value
+        elif isinstance(node, ast.ClassDef):
+            cls = mirror_class(node, lines, resolver)
+            resolver.namespace[node.name] = cls
+            setattr(module, node.name, cls)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            function = _apply_decorators(node, mirror_function(node, resolver, qualname=node.name), resolver, {})
+            resolver.namespace[node.name] = function
+            setattr(module, node.name, function)
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+            annotations[node.target.id] = resolver.resolve_annotation(node.annotation)
+            if node.value is not None:
+                _bind_alias(resolver, node.target.id, node.value)
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    _bind_alias(resolver, target.id, node.value)
+
+    if annotations:
+        module.__annotations__ = annotations
+    return module
+
+
+def _bind_alias(resolver: AnnotationResolver, name: str, value: ast.AST):
+    try:
+        resolver.namespace[name] = resolver.resolve(value)
+    except (ValueError, SyntaxError):
+        resolver.namespace.pop(name, None)
+
+
+def mirror_class(node: ast.ClassDef, lines: List[str], resolver: AnnotationResolver) -> type:
+    body = {'__module__': resolver.module_name, '__qualname__': node.name}
+    annotations = {}
+    for statement in node.body:
+        if isinstance(statement, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            function = mirror_function(statement, resolver, qualname=f'{node.name}.{statement.name}', local_namespace=body, class_name=node.name)
+            body[mangle(statement.name, node.name)] = _apply_decorators(statement, function, resolver, body)
+        elif isinstance(statement, ast.AnnAssign) and isinstance(statement.target, ast.Name):
+            annotations[statement.target.id] = resolver.resolve_annotation(statement.annotation, body)
+            if statement.value is not None:
+                body[statement.target.id] = _class_attribute_value(statement.value)
+        elif isinstance(statement, ast.Assign):
+            for target in statement.targets:
+                if isinstance(target, ast.Name):
+                    body[target.id] = _class_attribute_value(statement.value)
+        elif isinstance(statement, ast.ClassDef):
+            body[statement.name] = UnresolvedValue()
+    if annotations:
+        body['__annotations__'] = annotations
+    if '__slots__' in body and not _is_slots_literal(body['__slots__']):
+        del body['__slots__']  # type() would have to iterate it, e.g. __slots__ = date.__slots__ + time.__slots__
+
+    bases = tuple(resolver.resolve_annotation(x) for x in node.bases)
+    try:
+        cls = types.new_class(node.name, bases, exec_body=lambda ns: ns.update(body))
+    except TypeError:
+        cls = types.new_class(node.name, (), exec_body=lambda ns: ns.update(body))
+    setattr(cls, STATIC_SOURCE_ATTRIBUTE, _class_source(node, lines))
+    return cls
+
+
+def _class_attribute_value(node: ast.AST) -> Any:
+    try:
+        return literal_value(node)
+    except ValueError:
+        return UnresolvedValue()
+
+
+def _is_slots_literal(value: Any) -> bool:
+    """Whether value is a string or a collection of strings, which type() accepts as __slots__"""
+    return isinstance(value, str) or (isinstance(value, (list, tuple, dict)) and all(isinstance(x, str) for x in value))
+
+
+def _class_source(node: ast.ClassDef, lines: List[str]) -> str:
+    """Same lines inspect.getsource returns for the class: from the class statement to the end of its block"""
+    start = node.lineno - 1
+    while not lines[start].lstrip().startswith('class'):
+        start += 1
+    return ''.join(inspect.getblock(lines[start:]))
+
+
+def _apply_decorators(node: ast.FunctionDef, function, resolver: AnnotationResolver, class_namespace: dict):
+    result = function
+    for decorator in reversed(node.decorator_list):
+        if isinstance(decorator, ast.Attribute) and isinstance(decorator.value, ast.Name) \
+                and isinstance(class_namespace.get(decorator.value.id), property):
+            result = getattr(class_namespace[decorator.value.id], decorator.attr)(result)
+            continue
+        try:
+            resolved = resolver.resolve(decorator, class_namespace)
+        except ValueError:
+            continue
+        if resolved in (staticmethod, classmethod, property, typing.overload):
+            result = resolved(result)
+    return result
+
+
+def mangle(name: str, class_name: Optional[str]) -> str:
+    """Private name mangling the compiler applies to __names inside a class body"""
+    if class_name is None or not name.startswith('__') or name.endswith('__') or class_name.strip('_') == '':
+        return name
+    return f'_{class_name.lstrip("_")}{name}'
+
+
+def mirror_function(node: ast.FunctionDef, resolver: AnnotationResolver, qualname: str, local_namespace: Optional[dict] = None,
+                    class_name: Optional[str] = None):
+    parameters = []
+    annotations = {}
+    args = node.args
+    positional = args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + args.defaults
+    kind_and_args = \
+        [(inspect.Parameter.POSITIONAL_OR_KEYWORD, x, d) for x, d in zip(positional, defaults)] + \
+        ([(inspect.Parameter.VAR_POSITIONAL, args.vararg, None)] if args.vararg else []) + \
+        [(inspect.Parameter.KEYWORD_ONLY, x, d) for x, d in zip(args.kwonlyargs, args.kw_defaults)] + \
+        ([(inspect.Parameter.VAR_KEYWORD, args.kwarg, None)] if args.kwarg else [])
+    for kind, arg, default in kind_and_args:
+        annotation = resolver.resolve_annotation(arg.annotation, local_namespace)
+        name = mangle(arg.arg, class_name)
+        if arg.annotation is not None:
+            annotations[name] = annotation
+        parameters.append(inspect.Parameter(
+            name,
+            kind,
+            default=inspect.Parameter.empty if default is None else _default_value(default, resolver, local_namespace),
+            annotation=annotation,
+        ))
+    return_annotation = resolver.resolve_annotation(node.returns, local_namespace)
+    if node.returns is not None:
+        annotations['return'] = return_annotation
+
+    if isinstance(node, ast.AsyncFunctionDef):
+        async def function(*args, **kwargs):
+            raise MirroredFunctionCallError(f'{qualname} was extracted statically and can\'t be called')
+    else:
+        def function(*args, **kwargs):
+            raise MirroredFunctionCallError(f'{qualname} was extracted statically and can\'t be called')
+    function.__name__ = node.name
+    function.__qualname__ = qualname
+    function.__module__ = resolver.module_name
+    function.__annotations__ = annotations
+    function.__signature__ = inspect.Signature(parameters, return_annotation=return_annotation)
+    return function
+
+
+def _default_value(node: ast.AST, resolver: AnnotationResolver, local_namespace: Optional[dict]):
+    try:
+        return literal_value(node)
+    except ValueError:
+        pass
+    try:
+        return resolver.resolve(node, local_namespace)
+    except ValueError:
+        return Ellipsis
+
+
+def get_static_source(obj) -> Optional[str]:
+    """Source of a module or class mirrored from its ast, None for regular objects"""
+    return vars(obj).get(STATIC_SOURCE_ATTRIBUTE)
+
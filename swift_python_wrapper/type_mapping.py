@@ -0,0 +1,168 @@
+"""
+Maps python annotations to Swift type names.
+
+Conversion dispatches, in order, on the exact annotation (or the qualified name of a class), on its typing origin
+(Union for Optional[int]) and finally on its kind (the class of the annotation: str, TypeVar, GenericMeta...).
+Projects can add their own mappings with register_swift_type, register_origin and register_kind.
+Results are memoized per hashable annotation, type_mapping_cache_info reports the cache hits and misses.
+
+Returned python objects are converted with swift_type(val), unless another expression was registered for the Swift
+type with register_from_python. Buffer types (array.array, memoryview, numpy.ndarray) map to TPBuffer, which reads
+their data in place, and set_numeric_list_mappings makes List[float] and List[int] Swift arrays copied in one go.
+"""
+import inspect
+import re
+from functools import lru_cache
+from typing import Any, Union, Tuple, TypeVar, GenericMeta, _ForwardRef, Callable, Dict, List
+
+Converter = Callable[[Any], str]
+
+_types: Dict[Any, Union[str, Converter]] = {}
+_origins: Dict[Any, Converter] = {}
+_kinds: Dict[type, Converter] = {}
+_from_python: Dict[str, str] = {}
+
+NUMERIC_LISTS = {
+    List[float]: '[Double]',
+    List[int]: '[Int]',
+}
+_numeric_lists = False
+
+
+def register_swift_type(python_type, swift_type: Union[str, Converter]):
+    """
+    Maps an annotation to a Swift type name, or to a function returning it. python_type can also be the qualified
+    name of a class ('numpy.ndarray') so that it can be mapped without importing it.
+    """
+    _types[python_type] = swift_type
+    _convert_cached.cache_clear()
+
+
+def register_origin(origin, converter: Converter):
+    """Converts subscripted generics with the given typing origin, such as Union or List"""
+    _origins[origin] = converter
+    _convert_cached.cache_clear()
+
+
+def register_kind(kind: type, converter: Converter):
+    """Converts annotations whose class is exactly kind, such as TypeVar or str"""
+    _kinds[kind] = converter
+    _convert_cached.cache_clear()
+
+
+def register_from_python(swift_type: str, expression: str):
+    """Swift expression that converts the PythonObject {value} to swift_type, instead of the default swift_type({value})"""
+    _from_python[swift_type] = expression
+
+
+def convert_from_python(swift_type: str, value: str) -> str:
+    return _from_python.get(swift_type, '{swift_type}({value})').format(swift_type=swift_type, value=value)
+
+
+def set_numeric_list_mappings(enabled: bool):
+    """Map List[float] and List[int] to [Double] and [Int], copied through the buffer protocol, instead of TPList"""
+    global _numeric_lists
+    _numeric_lists = enabled
+    for python_type, swift_type in NUMERIC_LISTS.items():
+        if enabled:
+            _types[python_type] = swift_type
+        else:
+            _types.pop(python_type, None)
+    _convert_cached.cache_clear()
+
+
+def numeric_list_mappings() -> bool:
+    return _numeric_lists
+
+
+def convert_to_swift_type(python_type) -> str:
+    try:
+        return _convert_cached(python_type)
+    except TypeError:
+        # Unhashable annotation
+        return _convert(python_type)
+
+
+def type_mapping_cache_info():
+    return _convert_cached.cache_info()
+
+
+@lru_cache(maxsize=None)
+def _convert_cached(python_type) -> str:
+    return _convert(python_type)
+
+
+def _convert(python_type) -> str:
+    try:
+        mapping = _types.get(python_type)
+    except TypeError:
+        mapping = None
+    if mapping is None and isinstance(python_type, type):
+        mapping = _types.get(f'{python_type.__module__}.{python_type.__qualname__}')
+    if mapping is not None:
+        return mapping(python_type) if callable(mapping) else mapping
+
+    origin = getattr(python_type, '__origin__', None)
+    if origin is not None:
+        try:
+            converter = _origins.get(origin)
+        except TypeError:
+            converter = None
+        if converter is not None:
+            return converter(python_type)
+
+    converter = _kinds.get(type(python_type))
+    if converter is not None:
+        return converter(python_type)
+    return _convert_named(python_type)
+
+
+def _convert_named(python_type) -> str:
+    return f'TP{python_type.__name__}'
+
+
+def _convert_str(python_type: str) -> str:
+    if python_type in ['T', 'V', 'G']:
+        return python_type
+    match = re.match(r'(\w+)\[(\w+(?:\s*,\s*\w+)*)]', python_type)
+    if match:
+        t, tvs = match.groups()
+        converted_tvs = [convert_to_swift_type(x.strip()) for x in tvs.split(',')]
+        return f'TP{t}<{", ".join(converted_tvs)}>'
+    return f'TP{python_type}'
+
+
+def _convert_union(python_type) -> str:
+    if python_type.__args__[1] == type(None):
+        return convert_to_swift_type(python_type.__args__[0]) + '?'
+    return _convert_named(python_type)
+
+
+def _convert_tuple(python_type) -> str:
+    args = [convert_to_swift_type(x) for x in python_type.__args__]
+    return f'({", ".join(args)})'
+
+
+def _convert_generic(python_type) -> str:
+    return f'TP{python_type.__name__}<{_convert_element(python_type.__args__[0])}>'
+
+
+def _convert_element(python_type) -> str:
+    """Element types of generics must be TPobject wrappers, so numeric lists only map to Swift arrays at the top level"""
+    if _numeric_lists and any(python_type == x for x in NUMERIC_LISTS):
+        return _convert_generic(python_type)
+    return convert_to_swift_type(python_type)
+
+
+for _python_type in [Any, type(None), inspect.Parameter.empty]:
+    register_swift_type(_python_type, 'TPobject')
+for _python_type in [memoryview, 'array.array', 'numpy.ndarray']:
+    register_swift_type(_python_type, 'TPBuffer')
+for _swift_type in NUMERIC_LISTS.values():
+    register_from_python(_swift_type, '{swift_type}(pythonBuffer: {value})')
+register_origin(Union, _convert_union)
+register_kind(str, _convert_str)
+register_kind(TypeVar, lambda python_type: python_type.__name__)
+register_kind(type(Tuple), _convert_tuple)
+register_kind(GenericMeta, _convert_generic)
+register_kind(_ForwardRef, lambda python_type: f'TP{python_type.__forward_arg__}')
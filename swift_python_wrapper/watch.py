@@ -0,0 +1,155 @@
+"""
+Long running generation for the edit stub / rebuild Swift loop. The interpreter, the compiled templates and the
+extracted SwiftModule of every module stay in memory, and only the modules whose source changed are extracted
+and rendered again.
+
+Sources are polled with stat, so no file system notification library is needed. A build system can also ask for
+an update over a local socket, one JSON request per line:
+
+    {"command": "regenerate"}  regenerates what changed since the last update, then replies
+                               {"regenerated": [...], "removed": [...], "errors": {...}, "seconds": 0.02}
+    {"command": "status"}      replies {"modules": {"mathy": {"classes": 1, "functions": 0}}, "errors": {...}}
+                               with the errors of the modules whose current source failed
+"""
+import json
+import os
+import socketserver
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple, Optional
+
+from swift_python_wrapper.core import extract_module, get_module_sources, generation_settings, write_module, \
+    write_typed_python_index, clear_caches
+from swift_python_wrapper.layout import LayoutError
+from swift_python_wrapper.manifest import Manifest, hash_file
+from swift_python_wrapper.rendering import SwiftModule
+
+
+class WatchUpdate(NamedTuple):
+    regenerated: List[str]
+    removed: List[str]
+    errors: Dict[str, str]  # Error extracting or rendering each module that failed in this update, by module name
+    seconds: float
+
+    def as_dict(self) -> dict:
+        return dict(self._asdict())
+
+
+class Watcher:
+    def __init__(self, module_name: Optional[str], module_path: str, target_dir: str, static: bool = False):
+        self.module_name = module_name
+        self.module_path = module_path
+        self.target_dir = target_dir
+        self.static = static
+        self.modules: Dict[str, SwiftModule] = {}
+        self.errors: Dict[str, str] = {}
+        self.manifest = Manifest(target_dir, settings=generation_settings(static))
+        self._stats: Dict[str, Tuple[int, int]] = {}  # Modification time and size of each source
+        self._source_hashes: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def update(self) -> WatchUpdate:
+        """Extracts and renders the modules whose source changed, and forgets the ones that were removed"""
+        with self._lock:
+            start = time.perf_counter()
+            sources = dict(get_module_sources(self.module_name, self.module_path, static=self.static))
+            regenerated, errors = [], {}
+            for name, path in sources.items():
+                if self._changed(name, path):
+                    error = self._regenerate(name, path)
+                    if error is None:
+                        regenerated.append(name)
+                    else:
+                        errors[name] = error
+            removed = [name for name in self._stats if name not in sources]
+            for name in removed:
+                for state in [self._stats, self._source_hashes, self.modules, self.errors]:
+                    state.pop(name, None)
+            if regenerated or removed:
+                try:
+                    rewritten = write_typed_python_index(self.target_dir, [SwiftModule(module_name=name, vars=[], functions=[], classes=[]) for name in sources])
+                except LayoutError as e:  # The package keeps its previous layout until the conflict is fixed
+                    rewritten = {}
+                    errors.update((name, f'{e.__class__.__name__}: {e}') for name in e.modules)
+                for name, output_hash in rewritten.items():
+                    self.manifest.update_output_hash(name, output_hash)
+                self.manifest.prune(sources)
+                self.manifest.save()
+            return WatchUpdate(regenerated, removed, errors, time.perf_counter() - start)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                'modules': {name: {'classes': len(x.classes), 'functions': len(x.functions)} for name, x in self.modules.items()},
+                'errors': dict(self.errors),
+            }
+
+    def _changed(self, name: str, path: str) -> bool:
+        try:
+            stat = os.stat(path)
+            key = (stat.st_mtime_ns, stat.st_size)
+            if self._stats.get(name) == key:
+                return False
+            source_hash = hash_file(path)
+        except OSError:
+            # Removed or renamed since the directory was listed, as editors saving atomically do. The next poll sees
+            # either the new file or that it's gone
+            return False
+        self._stats[name] = key
+        if self._source_hashes.get(name) == source_hash:
+            return False
+        self._source_hashes[name] = source_hash
+        return True
+
+    def _regenerate(self, name: str, path: str) -> Optional[str]:
+        """Error message if the module couldn't be regenerated"""
+        clear_caches()  # Otherwise they'd keep every version of the module's classes and source alive
+        try:
+            module = extract_module(name, path, static=self.static)
+            rendered = write_module(module, self.target_dir)
+        except Exception as e:  # A half edited source shouldn't stop the watcher, the error is reported instead
+            self.errors[name] = f'{e.__class__.__name__}: {e}'
+            return self.errors[name]
+        self.errors.pop(name, None)
+        self.modules[name] = module
+        self.manifest.record(name, source_hash=self._source_hashes[name], output_file=rendered.output_file,
+                             output_hash=rendered.output_hash)
+        return None
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                command = json.loads(line.decode()).get('command')
+            except (ValueError, AttributeError):
+                command = None
+            if command == 'regenerate':
+                response = self.server.watcher.update().as_dict()
+            elif command == 'status':
+                response = self.server.watcher.status()
+            else:
+                response = {'error': f'Unknown request {line.decode().strip()!r}'}
+            self.wfile.write(json.dumps(response).encode() + b'\n')
+            self.wfile.flush()
+
+
+class WatchServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, watcher: Watcher):
+        if Path(socket_path).is_socket():
+            Path(socket_path).unlink()
+        super().__init__(socket_path, _RequestHandler)
+        self.watcher = watcher
+
+    def server_close(self):
+        super().server_close()
+        Path(self.server_address).unlink()
+
+
+def serve_in_background(socket_path: str, watcher: Watcher) -> WatchServer:
+    server = WatchServer(socket_path, watcher)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,77 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from samples import basic, basic_module, batch_module, complex, mathy
+from swift_python_wrapper.core import create_module_orm
+from swift_python_wrapper.crossings import analyze_crossings, count_crossings, crossings_report, write_crossings_report, \
+    MemberCrossings
+
+
+def _crossings(module) -> dict:
+    return {(x.type_name, x.member): x.crossings for x in analyze_crossings(create_module_orm(module).render())}
+
+
+def test_analyze_crossings():
+    code = '''
+struct TPA: TPobject {
+    static let _py_f = wrappedClass[dynamicMember: "f"]
+    var x: TPint { return TPint(wrappedInstance[dynamicMember: "x"]) }
+
+    func f() -> Int {
+        let val = TPA._py_f(wrappedInstance)
+        return Int(val)!
+    }
+}
+
+extension TPA: Sequence {
+  public struct Iterator : IteratorProtocol {
+    mutating public func next() -> Element? {
+      guard let val = pythonIterator.next() else { return nil }
+      return Element.init(val)
+    }
+  }
+}
+'''
+    assert analyze_crossings(code) == [
+        MemberCrossings('TPA', 'var x: TPint', 1),
+        MemberCrossings('TPA', 'func f() -> Int', 2),
+        MemberCrossings('TPA.Iterator', 'mutating public func next() -> Element?', 1),
+    ]
+
+
+def test_count_crossings():
+    assert count_crossings('return { (TPint($0.0), T($0.1)) }(wrappedInstance[dynamicMember: "shape"].tuple2)') == 3
+    assert count_crossings('if val == Python.None { return nil }') == 1
+    assert count_crossings('return Int(Python.len(self.wrappedInstance))!') == 2
+    assert count_crossings('wrappedInstance.__setitem__(index.wrappedInstance, newValue.wrappedInstance)') == 2
+
+
+@pytest.mark.parametrize('module,total', [(basic, 89), (basic_module, 21), (batch_module, 9), (complex, 76), (mathy, 29)])
+def test_sample_totals(module, total):
+    assert crossings_report(module.__name__, create_module_orm(module).render())['total'] == total
+
+
+def test_sample_members():
+    crossings = _crossings(complex)
+    assert crossings[('TPComplexClass4', 'var shape: (TPint, T)')] == 3  # One fetch, unpacked with one .tuple2
+    assert crossings[('TPComplexClass4', 'func snapshot() -> Snapshot')] == 1
+    # The fetched tuple is unpacked once, and the scalars copied to Swift values
+    assert crossings[('TPComplexClass4.Snapshot', 'fileprivate init(_ values: PythonObject)')] == 6
+    crossings = _crossings(mathy)
+    assert crossings[('TPVector2D', 'var x: TPfloat')] == 1
+    assert crossings[('TPVector2D', 'func add_if_even(scalar: TPfloat) -> TPVector2D?')] == 2
+    assert crossings[('TPythonModule_samples_mathy', 'static func Vector2D(x: TPfloat, y: TPfloat) -> TPVector2D')] == 0
+    crossings = _crossings(batch_module)
+    assert crossings[('TPythonModule_samples_batch_module', 'static func parse(batch: [TPstr]) -> [TPint?]')] == 3
+
+
+def test_write_crossings_report(tmpdir):
+    swift_path = Path(str(tmpdir)) / 'TPythonModule_mathy.swift'
+    swift_path.write_text(create_module_orm(mathy).render())
+    report_path = write_crossings_report('mathy', swift_path)
+    assert report_path.name == 'TPythonModule_mathy.crossings.json'
+    report = json.loads(report_path.read_text())
+    assert report['module'] == 'mathy'
+    assert report['total'] == sum(x['crossings'] for x in report['members'])
@@ -0,0 +1,31 @@
+from typing import Union, Any, Optional
+
+import pytest
+
+from swift_python_wrapper.core import flatten_functions, set_max_union_overloads, UnionOverloadLimitWarning, \
+    MAX_UNION_OVERLOADS
+from swift_python_wrapper.rendering import Function, NameAndType
+
+
+def test_flatten_functions_order():
+    f = Function(name='f', args=[NameAndType('x', Union[int, str]), NameAndType('y', Union[float, bool])], cls='instancemethod')
+    assert [[a.type for a in x.args] for x in flatten_functions([f])] == [
+        [int, float], [str, float], [int, bool], [str, bool],
+    ]
+
+
+def test_flatten_functions_drops_duplicate_signatures():
+    f = Function(name='f', args=[NameAndType('x', Optional[Any])], cls='instancemethod')
+    assert flatten_functions([f]) == [Function(name='f', args=[NameAndType('x', Any)], cls='instancemethod')]
+
+
+def test_flatten_functions_limit():
+    f = Function(name='f', args=[NameAndType(f'x{i}', Union[int, str, float]) for i in range(3)] + [NameAndType('y', int)], cls='instancemethod')
+    set_max_union_overloads(26)
+    try:
+        with pytest.warns(UnionOverloadLimitWarning, match=r'A\.f: 27 Union overloads'):
+            flattened = flatten_functions([f], owner='A')
+    finally:
+        set_max_union_overloads(MAX_UNION_OVERLOADS)
+    assert flattened == [Function(name='f', args=[NameAndType('x0', Any), NameAndType('x1', Any), NameAndType('x2', Any), NameAndType('y', int)], cls='instancemethod')]
+    assert len(flatten_functions([f])) == 27
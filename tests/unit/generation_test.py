@@ -0,0 +1,121 @@
+import multiprocessing
+from pathlib import Path
+from shutil import copy
+
+import pytest
+
+from swift_python_wrapper.core import build_swift_wrappers_module, render_modules, get_module_sources
+from swift_python_wrapper.layout import LayoutError, set_output_layout
+from swift_python_wrapper.rendering import set_instrumentation
+from swift_python_wrapper.type_mapping import set_numeric_list_mappings
+
+SAMPLES = Path(__file__).parent.parent.parent / 'samples'
+
+
+def _copy_samples(source_dir):
+    for name in ['basic.py', 'basic_module.py', 'complex.py', 'mathy.py']:
+        copy(str(SAMPLES / name), str(source_dir))
+
+
+def test_parallel_output_matches_serial(tmpdir):
+    source_dir, serial_dir, parallel_dir = tmpdir.mkdir('src'), tmpdir.mkdir('serial'), tmpdir.mkdir('parallel')
+    _copy_samples(source_dir)
+    build_swift_wrappers_module(None, str(source_dir), str(serial_dir), jobs=1)
+    build_swift_wrappers_module(None, str(source_dir), str(parallel_dir), jobs=3)
+    serial_files = sorted(Path(str(serial_dir)).iterdir())
+    assert [x.name for x in serial_files] == sorted(x.name for x in Path(str(parallel_dir)).iterdir())
+    for path in serial_files:
+        assert path.read_bytes() == (Path(str(parallel_dir)) / path.name).read_bytes()
+
+
+def test_spawned_workers_use_the_settings(tmpdir):
+    source_dir, serial_dir, parallel_dir = tmpdir.mkdir('src'), tmpdir.mkdir('serial'), tmpdir.mkdir('parallel')
+    _copy_samples(source_dir)
+    start_method = multiprocessing.get_start_method()
+    set_instrumentation(True)
+    set_numeric_list_mappings(True)
+    set_output_layout(shard_size=20000)
+    try:
+        build_swift_wrappers_module(None, str(source_dir), str(serial_dir), jobs=1)
+        multiprocessing.set_start_method('spawn', force=True)
+        build_swift_wrappers_module(None, str(source_dir), str(parallel_dir), jobs=2)
+    finally:
+        multiprocessing.set_start_method(start_method, force=True)
+        set_instrumentation(False)
+        set_numeric_list_mappings(False)
+        set_output_layout()
+    serial_files = sorted(Path(str(serial_dir)).iterdir())
+    assert [x.name for x in serial_files] == sorted(x.name for x in Path(str(parallel_dir)).iterdir())
+    for path in serial_files:
+        assert path.read_bytes() == (Path(str(parallel_dir)) / path.name).read_bytes()
+
+
+def test_render_modules_keeps_source_order(tmpdir):
+    source_dir, target_dir = tmpdir.mkdir('src'), tmpdir.mkdir('out')
+    _copy_samples(source_dir)
+    sources = [(name, str(source_dir / f'{name}.py')) for name in ['mathy', 'basic', 'basic_module']]
+    assert [x.module_name for x in render_modules(sources, str(target_dir), jobs=2)] == ['mathy', 'basic', 'basic_module']
+
+
+def _make_package(root: Path):
+    (root / 'geo' / 'shapes' / '__pycache__').mkdir(parents=True)
+    (root / 'ns').mkdir()
+    (root / 'geo' / '__init__.py').write_text('def origin() -> int:\n    return 0\n')
+    copy(str(SAMPLES / 'mathy.py'), str(root / 'geo' / 'shapes' / 'vectors.py'))
+    (root / 'geo' / 'shapes' / '__pycache__' / 'cached.py').write_text('')
+    (root / 'ns' / 'util.pyi').write_text('')
+    (root / 'ns' / 'util.py').write_text('')
+    (root / 'stubbed.pyi').write_text('')
+    (root / 'notes.txt').write_text('')
+    copy(str(SAMPLES / 'basic_module.py'), str(root))
+
+
+def test_module_sources_follow_the_package_layout(tmpdir):
+    root = Path(str(tmpdir))
+    _make_package(root)
+    sources = get_module_sources(None, str(root), static=True)
+    assert next(sources) == ('basic_module', str(root / 'basic_module.py'))
+    sources = list(sources)
+    assert [name for name, _ in sources] == ['geo', 'geo.shapes.vectors', 'ns.util', 'stubbed']
+    assert sources[-2] == ('ns.util', str(root / 'ns' / 'util.pyi'))  # The stub wins over util.py
+    # Imported, stubs can't be loaded
+    sources = list(get_module_sources(None, str(root)))
+    assert [name for name, _ in sources] == ['basic_module', 'geo', 'geo.shapes.vectors', 'ns.util']
+    assert sources[-1] == ('ns.util', str(root / 'ns' / 'util.py'))
+    assert [name for name, _ in get_module_sources('vendor', str(root))][:2] == ['vendor.basic_module', 'vendor.geo']
+
+
+def test_nested_modules(tmpdir):
+    source_dir, target_dir = Path(str(tmpdir.mkdir('src'))), Path(str(tmpdir.mkdir('out')))
+    _make_package(source_dir)
+    build_swift_wrappers_module(None, str(source_dir), str(target_dir), static=True)
+    assert sorted(x.name for x in target_dir.glob('*.swift')) == [
+        'TPythonModule_basic_module.swift', 'TPythonModule_geo.swift', 'TPythonModule_geo_shapes_vectors.swift',
+        'TPythonModule_ns_util.swift', 'TPythonModule_stubbed.swift', 'typed_python.swift',
+    ]
+    assert 'Python.import("geo.shapes.vectors").Vector2D' in (target_dir / 'TPythonModule_geo_shapes_vectors.swift').read_text()
+    index = (target_dir / 'typed_python.swift').read_text()
+    assert 'let geo = TPythonModule_geo.self' in index
+    assert 'extension TPythonModule_geo {\n    static let shapes = TPythonModule_geo_shapes.self\n}' in index
+    assert 'enum TPythonModule_geo_shapes {\n    static let vectors = TPythonModule_geo_shapes_vectors.self\n}' in index
+    assert 'enum TPythonModule_ns {\n    static let util = TPythonModule_ns_util.self\n}' in index
+
+    # Imported, an empty __init__.py has no source as far as inspect is concerned
+    source_dir, target_dir = Path(str(tmpdir.mkdir('imported'))), Path(str(tmpdir.mkdir('imported_out')))
+    (source_dir / 'geo' / 'shapes').mkdir(parents=True)
+    (source_dir / 'geo' / '__init__.py').write_text('')
+    (source_dir / 'geo' / 'shapes' / '__init__.py').write_text('')
+    copy(str(SAMPLES / 'mathy.py'), str(source_dir / 'geo' / 'shapes' / 'vectors.py'))
+    build_swift_wrappers_module(None, str(source_dir), str(target_dir))
+    assert sorted(x.name for x in target_dir.glob('*.swift')) == [
+        'TPythonModule_geo.swift', 'TPythonModule_geo_shapes.swift', 'TPythonModule_geo_shapes_vectors.swift', 'typed_python.swift',
+    ]
+
+
+def test_modules_defining_the_same_class(tmpdir):
+    source_dir, target_dir = Path(str(tmpdir.mkdir('src'))), str(tmpdir.mkdir('out'))
+    for package in ['b', 'c']:
+        (source_dir / 'a' / package).mkdir(parents=True)
+        (source_dir / 'a' / package / 'config.py').write_text('class Config:\n    def get(self, key: str) -> str: ...\n')
+    with pytest.raises(LayoutError, match=r'TPConfig \(a\.b\.config, a\.c\.config\)'):
+        build_swift_wrappers_module(None, str(source_dir), target_dir, static=True)
@@ -0,0 +1,90 @@
+import json
+import sys
+from pathlib import Path
+from shutil import copy, rmtree
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar, Union
+
+import pytest
+
+from samples import basic, basic_module, batch_module, complex, mathy
+from swift_python_wrapper.core import create_module_orm, build_swift_wrappers_module, extract_module
+from swift_python_wrapper.ir import module_to_ir, module_from_ir, encode_type, build_ir, render_ir, read_ir, ir_path, \
+    IRError, _TypeDecoder, EXTRACTOR_MODULES
+
+SAMPLES = Path(__file__).parent.parent.parent / 'samples'
+STUBS = Path(__file__).parent.parent.parent / 'stubs'
+
+
+def _round_trip(module):
+    return module_from_ir(json.loads(json.dumps(module_to_ir(module))))
+
+
+@pytest.mark.parametrize('module', [basic, basic_module, batch_module, complex, mathy])
+def test_rendering_from_ir_is_identical(module):
+    orm = create_module_orm(module)
+    assert _round_trip(orm).render() == orm.render()
+
+
+@pytest.mark.parametrize('static', [False, True])
+def test_builtins_stub_rendering_from_ir_is_identical(static):
+    orm = extract_module('builtins.stub', str(STUBS / 'builtins.stub.py'), static=static)
+    assert _round_trip(orm).render() == orm.render()
+
+
+def test_type_references():
+    T = TypeVar('T')
+    decoder = _TypeDecoder()
+    for t in [None, 'List[T]', int, type(None), Any, Optional[int], Union[int, str, None], Tuple[int, float],
+              Dict[str, List[int]], Callable[[int], str], Callable[..., str]]:
+        assert decoder.type(json.loads(json.dumps(encode_type(t)))) == t
+    assert encode_type(mathy.Vector2D) == {'class': 'Vector2D', 'module': 'samples.mathy'}
+    stand_in = decoder.type(encode_type(mathy.Vector2D))
+    assert stand_in is not mathy.Vector2D and stand_in.__name__ == 'Vector2D' and stand_in.__module__ == 'samples.mathy'
+    assert decoder.type(encode_type(mathy.Vector2D)) is stand_in
+    assert decoder.type(encode_type(T)) is decoder.type(encode_type(Tuple[T, int])).__args__[0]
+
+
+def test_unsupported_version():
+    data = module_to_ir(create_module_orm(mathy))
+    data['version'] = 0
+    with pytest.raises(IRError):
+        module_from_ir(data)
+
+
+def test_extract_and_render(tmpdir):
+    source_dir, ir_dir = Path(str(tmpdir.mkdir('src'))), str(tmpdir / 'ir')
+    copy(str(SAMPLES / 'mathy.py'), str(source_dir))
+    copy(str(SAMPLES / 'basic_module.py'), str(source_dir))
+    assert sorted(build_ir(None, str(source_dir), ir_dir)) == ['basic_module', 'mathy']
+    assert build_ir(None, str(source_dir), ir_dir) == []
+    assert build_ir(None, str(source_dir), ir_dir, static=True) == ['basic_module', 'mathy']
+    assert read_ir(ir_path(ir_dir, 'mathy')).settings['static'] is True
+    build_ir(None, str(source_dir), ir_dir)
+
+    expected_dir = tmpdir.mkdir('expected')
+    build_swift_wrappers_module(None, str(source_dir), str(expected_dir))
+
+    # Rendering doesn't need, or import, the sources
+    rmtree(str(source_dir))
+    sys.modules.pop('mathy', None)
+    target_dir = Path(str(tmpdir / 'out'))
+    assert sorted(x.module_name for x in render_ir(ir_dir, str(target_dir))) == ['basic_module', 'mathy']
+    assert 'mathy' not in sys.modules
+    for name in ['TPythonModule_mathy.swift', 'TPythonModule_basic_module.swift', 'typed_python.swift']:
+        assert (target_dir / name).read_text() == (Path(str(expected_dir)) / name).read_text()
+
+
+def test_removed_modules_are_pruned(tmpdir):
+    source_dir, ir_dir = Path(str(tmpdir.mkdir('src'))), str(tmpdir / 'ir')
+    copy(str(SAMPLES / 'mathy.py'), str(source_dir))
+    copy(str(SAMPLES / 'basic_module.py'), str(source_dir))
+    build_ir(None, str(source_dir), ir_dir)
+    (source_dir / 'basic_module.py').unlink()
+    assert build_ir(None, str(source_dir), ir_dir) == []
+    assert not ir_path(ir_dir, 'basic_module').exists() and ir_path(ir_dir, 'mathy').exists()
+
+
+def test_extractor_modules_exist():
+    package = Path(__file__).parent.parent.parent / 'swift_python_wrapper'
+    assert all((package / x).is_file() for x in EXTRACTOR_MODULES)
+    assert 'layout.py' not in EXTRACTOR_MODULES and 'watch.py' not in EXTRACTOR_MODULES
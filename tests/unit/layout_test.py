@@ -0,0 +1,112 @@
+import json
+import re
+from pathlib import Path
+from shutil import copy
+
+import pytest
+
+from swift_python_wrapper.core import build_swift_wrappers_module
+from swift_python_wrapper.layout import set_output_layout, _swift_targets, _DEFINITION, SwiftTarget, LayoutError
+from swift_python_wrapper.manifest import hash_file
+
+SAMPLES = Path(__file__).parent.parent.parent / 'samples'
+STUBS = Path(__file__).parent.parent.parent / 'stubs'
+
+CONFORMANCE = re.compile(r'^extension \w+: [^{]+\{\n(.*?)^\}', re.MULTILINE | re.DOTALL)
+MEMBER = re.compile(r'^( +)(?:@\w+ )?((?:\w+ )*?)(?:init|typealias|func|var|let|subscript|struct)\b', re.MULTILINE)
+
+
+def _generate(tmpdir, shard_size=None, swift_package=None):
+    source_dir, target_dir = Path(str(tmpdir / 'src')), Path(str(tmpdir / 'out'))
+    if not source_dir.exists():
+        source_dir.mkdir()
+        target_dir.mkdir()
+        copy(str(SAMPLES / 'mathy.py'), str(source_dir))
+        copy(str(STUBS / 'builtins.stub.py'), str(source_dir))
+    set_output_layout(shard_size=shard_size, swift_package=swift_package)
+    try:
+        build_swift_wrappers_module(None, str(source_dir), str(target_dir))
+    finally:
+        set_output_layout()
+    return target_dir
+
+
+def _definitions(paths):
+    return sorted(x for path in paths for x in _DEFINITION.findall(path.read_text()))
+
+
+def test_shards(tmpdir):
+    target_dir = _generate(tmpdir)
+    single_file = target_dir / 'TPythonModule_builtins_stub.swift'
+    definitions = _definitions([single_file])
+
+    _generate(tmpdir, shard_size=20000)
+    shards = sorted(target_dir.glob('TPythonModule_builtins_stub*.swift'))
+    assert len(shards) > 2
+    assert all(x.read_text().startswith('import PythonKit\n\n') for x in shards)
+    assert _definitions(shards) == definitions
+    assert not list(target_dir.glob('TPythonModule_mathy.*.swift'))
+
+    _generate(tmpdir)
+    assert sorted(target_dir.glob('TPythonModule_builtins_stub*.swift')) == [single_file]
+    assert _definitions([single_file]) == definitions
+
+
+def test_swift_package(tmpdir):
+    target_dir = _generate(tmpdir, swift_package='Wrappers')
+    sources = target_dir / 'Sources'
+    mathy = (sources / 'TPython_mathy' / 'TPythonModule_mathy.swift').read_text()
+    assert mathy.startswith('import PythonKit\nimport TypedPython\nimport TPython_builtins_stub\n\n')
+    assert 'public struct TPVector2D: TPobject' in mathy
+    assert (sources / 'TPython_builtins_stub' / 'TPythonModule_builtins_stub.swift').read_text().startswith(
+        'import PythonKit\nimport TypedPython\n\n')
+    assert 'public protocol TPobject' in (sources / 'TypedPython' / 'typed_python.swift').read_text()
+    library = (sources / 'Wrappers' / 'TPython.swift').read_text()
+    assert '@_exported import TPython_mathy\n' in library and 'public let mathy = TPythonModule_mathy.self' in library
+
+    package = (target_dir / 'Package.swift').read_text()
+    assert 'name: "TPython_mathy",\n            dependencies: ["PythonKit", "TypedPython", "TPython_builtins_stub"]' in package
+    assert package.index('name: "TPython_builtins_stub"') < package.index('name: "TPython_mathy"')
+
+    # A public type's protocol witnesses must be public too
+    for path in sources.glob('TPython_*/*.swift'):
+        for body in CONFORMANCE.findall(path.read_text()):
+            members = list(MEMBER.finditer(body))
+            indent = min(len(x.group(1)) for x in members)
+            assert [x.group(0) for x in members if len(x.group(1)) == indent and not re.search(r'public|private', x.group(2))] == []
+
+    # The manifest has the hash of the main files once their imports are fixed, so they're up to date next time
+    manifest = json.loads((target_dir / '.swrap_manifest.json').read_text())['modules']['mathy']
+    assert manifest['output_hash'] == hash_file(str(target_dir / manifest['output_file']))
+
+
+def test_modules_defining_the_same_wrapper(tmpdir):
+    source_dir, target_dir = Path(str(tmpdir.mkdir('src'))), str(tmpdir.mkdir('out'))
+    (source_dir / 'pkg' / 'sub').mkdir(parents=True)
+    for path in [source_dir / 'pkg' / 'other.py', source_dir / 'pkg' / 'sub' / 'mod.py']:
+        path.write_text('class A:\n    def f(self) -> int: ...\n')
+    set_output_layout(swift_package='Wrappers')
+    try:
+        with pytest.raises(LayoutError) as error:
+            build_swift_wrappers_module(None, str(source_dir), target_dir, static=True)
+    finally:
+        set_output_layout()
+    assert error.value.modules == ['pkg.other', 'pkg.sub.mod']
+    assert 'TPA (pkg.other, pkg.sub.mod)' in str(error.value)
+
+
+def test_cyclic_modules_share_a_target():
+    targets = _swift_targets({'a': {'b'}, 'b': {'a', 'c'}, 'c': set(), 'd': {'a'}, 'e': set()})
+    assert targets == [
+        SwiftTarget(name='TPython_c', modules=['c'], dependencies=[]),
+        SwiftTarget(name='TPython_a_Group', modules=['a', 'b'], dependencies=['TPython_c']),
+        SwiftTarget(name='TPython_d', modules=['d'], dependencies=['TPython_a_Group']),
+        SwiftTarget(name='TPython_e', modules=['e'], dependencies=[]),
+    ]
+    assert targets[1].sources == ['TPython_a', 'TPython_b'] and targets[0].sources == []
+
+
+@pytest.mark.parametrize('name', ['TypedPython', 'TPython_x', 'my-wrappers'])
+def test_invalid_package_names(name):
+    with pytest.raises(ValueError):
+        set_output_layout(swift_package=name)
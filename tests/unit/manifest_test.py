@@ -0,0 +1,62 @@
+from pathlib import Path
+from shutil import copy
+
+import mock
+import pytest
+
+from swift_python_wrapper import core
+from swift_python_wrapper.core import build_swift_wrappers_module
+from swift_python_wrapper.manifest import Manifest, write_if_changed, hash_bytes, write_stream_if_changed, GENERATOR_MODULES
+
+SAMPLES = Path(__file__).parent.parent.parent / 'samples'
+
+
+def test_write_if_changed(tmpdir):
+    path = Path(str(tmpdir)) / 'a.swift'
+    assert write_if_changed(path, 'abc') == hash_bytes(b'abc')
+    mtime = path.stat().st_mtime_ns
+    write_if_changed(path, 'abc')
+    assert path.stat().st_mtime_ns == mtime
+
+
+def test_write_stream_if_changed_is_atomic(tmpdir):
+    path = Path(str(tmpdir)) / 'a.swift'
+    assert write_stream_if_changed(path, ['a', 'b', 'c']) == hash_bytes(b'abc')
+    assert path.read_text() == 'abc'
+
+    def failing_fragments():
+        yield 'x'
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        write_stream_if_changed(path, failing_fragments())
+    assert path.read_text() == 'abc'
+    assert [x.name for x in Path(str(tmpdir)).iterdir()] == ['a.swift']
+
+
+def test_unchanged_modules_are_skipped(tmpdir):
+    source_dir, target_dir = tmpdir.mkdir('src'), tmpdir.mkdir('out')
+    copy(str(SAMPLES / 'basic_module.py'), str(source_dir))
+    build_swift_wrappers_module(None, str(source_dir), str(target_dir))
+    assert 'basic_module' in Manifest.load(str(target_dir)).modules
+    with mock.patch.object(core, 'load_module_from_path') as load:
+        build_swift_wrappers_module(None, str(source_dir), str(target_dir))
+        assert not load.called
+    (Path(str(source_dir)) / 'basic_module.py').write_text('b: str = "b"\n')
+    build_swift_wrappers_module(None, str(source_dir), str(target_dir))
+    assert 'static var b: TPstr' in (Path(str(target_dir)) / 'TPythonModule_basic_module.swift').read_text()
+
+
+def test_force_regenerates(tmpdir):
+    source_dir, target_dir = tmpdir.mkdir('src'), tmpdir.mkdir('out')
+    copy(str(SAMPLES / 'basic_module.py'), str(source_dir))
+    build_swift_wrappers_module(None, str(source_dir), str(target_dir))
+    with mock.patch.object(core, 'load_module_from_path', wraps=core.load_module_from_path) as load:
+        build_swift_wrappers_module(None, str(source_dir), str(target_dir), force=True)
+        assert load.called
+
+
+def test_generator_modules_exist():
+    package = Path(__file__).parent.parent.parent / 'swift_python_wrapper'
+    assert all((package / x).is_file() for x in GENERATOR_MODULES)
+    assert 'watch.py' not in GENERATOR_MODULES and 'cli.py' not in GENERATOR_MODULES
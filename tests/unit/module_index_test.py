@@ -0,0 +1,43 @@
+import inspect
+
+import mock
+
+from samples import complex
+from swift_python_wrapper.core import create_module_orm
+from swift_python_wrapper.module_index import build_module_index
+from swift_python_wrapper.rendering import Function, NameAndType
+
+
+def test_build_module_index():
+    index = build_module_index(complex.__name__, inspect.getsource(complex))
+    assert list(index.classes.keys()) == ['ComplexClass1', 'ComplexClass2', 'ComplexClass3', 'ComplexClass4']
+    class3 = index.classes['ComplexClass3']
+    assert class3.swift_wrapper_annotations == ['ExpressibleByIntegerLiteral', 'ExpressibleByFloatLiteral', 'CPython']
+    assert ''.join(inspect.getsourcelines(complex.ComplexClass3)[0]) == \
+        ''.join(inspect.getsource(complex).splitlines(keepends=True)[class3.lines[0] - 1:class3.lines[1]])
+    assert index.classes['ComplexClass2'].overloads == [
+        Function(name='f', args=[NameAndType('x', int)], cls='ComplexClass2', return_type=int),
+        Function(name='f', args=[NameAndType('x', float)], cls='ComplexClass2', return_type=float),
+    ]
+    assert index.overloads == []
+
+
+def test_module_source_is_read_once():
+    build_module_index.cache_clear()
+    with mock.patch('inspect.getsource', wraps=inspect.getsource) as getsource:
+        create_module_orm(complex)
+    assert getsource.call_count == 1
+
+
+def test_class_annotations_are_not_module_function_annotations():
+    source = ('class C:\n'
+              '    # SWIFT_WRAPPER.f: Batch\n'
+              '    def f(self) -> int: ...\n'
+              '\n'
+              '\n'
+              '# SWIFT_WRAPPER.g: Batch\n'
+              'def f(x: int) -> int: ...\n'
+              'def g(x: int) -> int: ...\n')
+    index = build_module_index('annotations', source)
+    assert index.swift_wrapper_annotations == {'g': ['Batch']}
+    assert index.classes['C'].swift_wrapper_annotations == ['Batch']
@@ -1,8 +1,8 @@
 import mock
 
-from swift_python_wrapper.core import create_module_orm
+from swift_python_wrapper.core import create_module_orm, mark_keyword_args
 from swift_python_wrapper.rendering import SwiftModule, NameAndType, Function, SwiftClass, MagicMethods
-from samples import basic_module
+from samples import basic_module, batch_module
 
 
 def test_basic_module_orm():
@@ -21,3 +21,20 @@ def test_basic_module_orm():
             magic_methods=mock.ANY,
         )],
     )
+
+
+def test_batch_annotated_functions():
+    module = create_module_orm(batch_module)
+    assert [(x.name, x.batch) for x in module.functions] == [('parse', True), ('scale', True), ('single', False)]
+    code = module.render()
+    assert 'static func scale(batch: [(x: TPfloat, factor: TPfloat)]) -> [TPfloat] {' in code
+    assert 'static func parse(batch: [TPstr]) -> [TPint?] {' in code
+    assert 'single(batch:' not in code
+
+
+def test_keyword_args():
+    def f(a: int, b=2, c: int = 3, *args: int, d: int, **kwargs: int): ...
+
+    args = [NameAndType(k, v) for k, v in f.__annotations__.items()]
+    assert [(x.name, x.keyword) for x in mark_keyword_args(args, f)] == \
+        [('a', False), ('c', True), ('args', True), ('d', True), ('kwargs', True)]
@@ -1,9 +1,9 @@
-from typing import Any, Optional, List, TypeVar, Tuple
+from typing import Any, Optional, List, TypeVar, Tuple, NamedTuple, Iterator
 
 import mock
 
 from samples.complex import ComplexClass1, ComplexClass2, ComplexClass3, ComplexClass4
-from swift_python_wrapper.core import create_class_orm
+from swift_python_wrapper.core import create_class_orm, get_magic_methods
 from swift_python_wrapper.rendering import SwiftClass, NameAndType, Function, MagicMethods, BinaryMagicMethod, \
     UnaryMagicMethod, ExpressibleByLiteralProtocol
 from samples.basic import BasicClass, BasicClass2, BasicClass3, BasicClass4, BasicClass5
@@ -133,3 +133,87 @@ def test_complex_create_object_orm4():
     shape = swift_obj.instance_vars[2]
     assert shape.type == Tuple[int, swift_obj.type_vars[0]]
     assert swift_obj.render_type_vars() == '<T: TPobject>'
+
+
+def test_iterable_class_is_a_sequence():
+    class Numbers:
+        def __len__(self) -> int: ...
+        def __iter__(self) -> Iterator[int]: ...
+
+    magic_methods = get_magic_methods(Numbers, swift_wrapper_annotations=[])
+    assert magic_methods.Sequence
+    assert magic_methods.len__
+    assert magic_methods.iter__.element_type == int
+    code = SwiftClass('Numbers', 'numbers', [], [], [[]], [], magic_methods).render()
+    assert 'typealias Element = TPint' in code
+    assert 'Iterator(pythonIterator: self.wrappedInstance.makeIterator())' in code
+    assert 'public var underestimatedCount: Int' in code
+
+
+def test_indexable_class_is_a_random_access_collection():
+    class Word:
+        def __len__(self) -> int: ...
+        def __getitem__(self, i: int) -> str: ...
+
+    class Table:
+        def __len__(self) -> int: ...
+        def __getitem__(self, key: str) -> int: ...
+
+    magic_methods = get_magic_methods(Word, swift_wrapper_annotations=[])
+    assert magic_methods.RandomAccessCollection
+    assert magic_methods.Sequence
+    assert not get_magic_methods(Table, swift_wrapper_annotations=[]).RandomAccessCollection
+    code = SwiftClass('Word', 'words', [], [], [[]], [], magic_methods).render()
+    assert 'typealias Element = TPstr' in code
+    assert 'extension TPWord: RandomAccessCollection {' in code
+    assert 'public var count: Int { return Int(Python.len(self.wrappedInstance))! }' in code
+    assert 'return Element(self.wrappedInstance[position])' in code
+    assert 'return Iterator(collection: self, count: count)' in code  # len is read once per traversal
+    assert 'pythonIterator' not in code
+    assert 'var size: Int { return Int(Python.len(self.wrappedInstance))! }' in code
+
+
+class Point(NamedTuple):
+    x: float
+    y: float
+    label: str
+
+
+class Reading:
+    value: float
+
+
+class Record:
+    a: int
+    b: float
+    c: str
+    d: bool
+    e: Optional[int]
+
+
+class Particle:
+    position: Point
+    mass: float
+
+    def __init__(self, position: Point, mass: float):
+        self.position = position
+        self.mass = mass
+
+
+def test_snapshot_fields():
+    assert create_class_orm(Point).snapshot_fields == [NameAndType('x', float), NameAndType('y', float), NameAndType('label', str)]
+    code = create_class_orm(Particle).render()
+    assert 'private static let _snapshotGetter = Python.import("operator").attrgetter("position", "mass")' in code
+    assert 'return Snapshot(TPParticle._snapshotGetter(wrappedInstance))' in code
+    assert '            let fields = values.tuple2\n' in code
+    assert '        let mass: Double\n' in code and '            self.mass = Double(fields.1)!\n' in code
+    assert '            self.position = TPPoint(fields.0)\n' in code
+
+
+def test_snapshot_without_a_tuple_helper():
+    code = create_class_orm(Reading).render()
+    assert '            self.value = Double(values)!\n' in code
+    code = create_class_orm(Record).render()
+    assert 'tuple5' not in code
+    assert '            self.d = Bool(values[3])!\n' in code
+    assert '        let e: TPint?\n' in code
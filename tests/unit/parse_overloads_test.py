@@ -1,87 +1,11 @@
-from typing import Tuple
+from typing import Optional, TypeVar
 
-import pytest
+import mock
 
-from swift_python_wrapper.overload_parser import a_whitespace, ParseError, get_tk, a_str, a_id, a_typed_param, \
-    a_get_type, a_typed_params, a_def, parse_overloads
+from swift_python_wrapper.overload_parser import parse_overloads, parse_module_overloads
 from swift_python_wrapper.rendering import NameAndType, Function
 
 
-def test_a_whitespace():
-    i = a_whitespace(' \t\na\t', 0)
-    assert get_tk(' \t\na\t', i) == 'a'
-    assert i == 3
-    with pytest.raises(ParseError):
-        a_whitespace('a', 0)
-
-
-def test_a_str():
-    code = 'def abc():'
-    i = a_str(code, 0, 'def')
-    assert get_tk(code, i) == ' '
-    assert i == 3
-    with pytest.raises(ParseError):
-        a_str(code, 0, 'deaf abc()')
-
-
-def test_a_id():
-    code = 'a3b_3c('
-    identifier, i = a_id(code, 0)
-    assert identifier == 'a3b_3c'
-    assert get_tk(code, i) == '('
-    assert i == 6
-    with pytest.raises(ParseError):
-        a_id('3ab = 2', 0)
-
-
-def test_a_get_type():
-    code = 'int,'
-    t, i = a_get_type(code, 0)
-    assert get_tk(code, i) == ','
-    assert t == int
-    code = 'Tuple[int, Tuple[int, float]],'
-    t, i = a_get_type(code, 0)
-    assert t == Tuple[int, Tuple[int, float]]
-
-
-def test_a_typed_param():
-    code = 'a: int, '
-    nt, i = a_typed_param(code, 0)
-    assert get_tk(code, i) == ','
-    assert nt.name == 'a'
-    assert nt.type == int
-    code = 'a:Tuple[ float ,float ])'
-    nt, i = a_typed_param(code, 0)
-    assert get_tk(code, i) == ')'
-    assert nt == NameAndType(name='a', type=Tuple[float, float])
-
-
-def test_a_typed_params():
-    code = 'a: float, b: Tuple[int, float], c: str)'
-    tps, i = a_typed_params(code, 0)
-    assert get_tk(code, i) == ')'
-    assert tps == [NameAndType('a', float), NameAndType('b', Tuple[int, float]), NameAndType('c', str)]
-
-
-def test_a_def():
-    code = """def f(a: int, b: Tuple[float, int]) -> float: ..."""
-    assert a_def('AClass', code) == Function(
-        name='f',
-        args=[NameAndType('a', int), NameAndType('b', Tuple[float, int])],
-        cls='AClass',
-        return_type=float,
-    )
-
-    code = """def f(a: int, b: Tuple[float, int]):
-     ..."""
-    assert a_def('AClass', code) == Function(
-        name='f',
-        args=[NameAndType('a', int), NameAndType('b', Tuple[float, int])],
-        cls='AClass',
-        return_type=None,
-    )
-
-
 def test_parse_overloads():
     code = """\
 from typing import overload
@@ -130,3 +54,29 @@ class A:
         ),
     ]
 
+
+
+def test_parse_module_overloads():
+    code = """\
+from typing import overload, Optional, TypeVar
+
+T = TypeVar('T')
+
+@overload
+def f(x: int, y: 'Optional[int]' = None) -> T: ...
+
+class A:
+    @overload
+    def g(self, x: str, *, z: float = 1.5) -> 'B': ...
+
+class B:
+    def h(self, x: str) -> str: ...
+"""
+    overloads = parse_module_overloads(code, 'm')
+    assert list(overloads.keys()) == [None, 'A']
+    f = overloads[None][0]
+    assert f.args == [NameAndType('x', int), NameAndType('y', Optional[int], None)]
+    assert f.cls == 'm'
+    assert f.return_type.__class__ == TypeVar
+    assert overloads['A'] == [Function(name='g', args=[NameAndType('x', str), NameAndType('z', float, 1.5, keyword=True)], cls='A', return_type=mock.ANY)]
+    assert overloads['A'][0].mapped_return_type == 'TPB'
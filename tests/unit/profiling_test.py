@@ -0,0 +1,80 @@
+from pathlib import Path
+from shutil import copy
+
+from swift_python_wrapper.core import build_swift_wrappers_module
+from swift_python_wrapper.profiling import Profiler, start_profiling, stop_profiling, phase, profiled, PhaseStats
+
+SAMPLES = Path(__file__).parent.parent.parent / 'samples'
+
+
+def test_nested_phases_inherit_module_and_class():
+    profiler = start_profiling()
+    try:
+        with phase('module', module='m'):
+            with phase('class', cls='C'):
+                with phase('flatten'):
+                    pass
+                with phase('flatten'):
+                    pass
+            assert list(profiled('render', iter(['a', 'b']))) == ['a', 'b']
+    finally:
+        stop_profiling()
+    assert set(profiler.stats) == {('module', 'm', ''), ('class', 'm', 'C'), ('flatten', 'm', 'C'), ('render', 'm', '')}
+    assert profiler.stats[('flatten', 'm', 'C')].calls == 2
+    assert profiler.stats[('render', 'm', '')].calls == 1
+    report = profiler.report()
+    assert report['phases']['flatten']['calls'] == 2
+    assert set(report['modules']['m']) == {'module', 'class', 'flatten', 'render'}
+    assert set(report['classes']['m.C']) == {'class', 'flatten'}
+
+
+def test_peak_memory():
+    profiler = start_profiling()
+    try:
+        with phase('module', module='m'):
+            with phase('allocate'):
+                data = bytearray(4 * 2 ** 20)
+                del data
+    finally:
+        stop_profiling()
+    assert profiler.stats[('allocate', 'm', '')].peak_memory >= 4 * 2 ** 20
+    assert profiler.stats[('module', 'm', '')].peak_memory >= 4 * 2 ** 20
+
+
+def test_phases_do_nothing_without_profiling():
+    with phase('module', module='m') as frame:
+        assert frame is None
+    fragments = ['a']
+    assert profiled('render', fragments) is fragments
+
+
+def test_summary():
+    profiler = Profiler()
+    profiler.stats = {
+        ('module', 'fast', ''): PhaseStats(1, 0.1, 0),
+        ('module', 'slow', ''): PhaseStats(1, 2.0, 0),
+        ('extract', 'slow', ''): PhaseStats(1, 1.5, 0),
+        ('class', 'slow', 'C'): PhaseStats(3, 0.5, 2 ** 20),
+    }
+    summary = profiler.summary(top=1).splitlines()
+    assert summary[0] == 'Phases:'
+    assert [x.split()[0] for x in summary[1:4]] == ['module', 'extract', 'class']
+    assert summary[4] == 'Slowest modules:'
+    assert summary[5].split()[0] == 'slow'
+    assert 'extract 1.500 s' in summary[5]
+    assert summary[6] == 'Slowest classes:'
+    assert summary[7].split()[:4] == ['slow.C', '0.500', 's', 'peak'] and '1.0 MiB' in summary[7]
+
+
+def test_profiled_generation(tmpdir):
+    source_dir, target_dir = tmpdir.mkdir('src'), tmpdir.mkdir('out')
+    copy(str(SAMPLES / 'mathy.py'), str(source_dir))
+    profiler = start_profiling()
+    try:
+        build_swift_wrappers_module(None, str(source_dir), str(target_dir))
+    finally:
+        stop_profiling()
+    report = profiler.report()
+    assert {'module', 'load', 'index', 'extract', 'class', 'flatten', 'render', 'write', 'typed_python'} <= set(report['phases'])
+    assert report['modules']['mathy']['module']['calls'] == 1
+    assert report['classes']['mathy.Vector2D']['class']['calls'] == 1
@@ -0,0 +1,68 @@
+from pathlib import Path
+
+from swift_python_wrapper.core import create_module_orm, load_module_from_path
+from swift_python_wrapper.rendering import get_template_env, set_bytecode_cache_dir, _render, set_instrumentation
+from swift_python_wrapper.static_extraction import create_static_module_orm
+
+
+def test_template_env_is_shared():
+    assert get_template_env() is get_template_env()
+    assert get_template_env().get_template('object.swift.j2') is get_template_env().get_template('object.swift.j2')
+
+
+def test_bytecode_cache_dir(tmpdir):
+    set_bytecode_cache_dir(str(tmpdir))
+    try:
+        _render('typed_python.swift.j2', {'modules': []})
+        assert len(tmpdir.listdir()) == 1
+    finally:
+        set_bytecode_cache_dir(None)
+    assert get_template_env().bytecode_cache is None
+
+
+def test_generate_matches_render():
+    samples = Path(__file__).parent.parent.parent / 'samples'
+    module = create_module_orm(load_module_from_path('mathy', str(samples / 'mathy.py')))
+    fragments = list(module.generate())
+    assert len(fragments) > 1
+    assert ''.join(fragments) == module.render()
+
+
+def test_methods_call_cached_handles():
+    samples = Path(__file__).parent.parent.parent / 'samples'
+    code = create_module_orm(load_module_from_path('basic_module', str(samples / 'basic_module.py'))).render()
+    assert code.count('private static let _py_foo = wrappedModule[dynamicMember: "foo"]') == 1
+    assert 'let val = _py_foo(x.wrappedInstance)' in code
+    code = create_module_orm(load_module_from_path('mathy', str(samples / 'mathy.py'))).render()
+    assert 'let val = TPVector2D._py_magnitude(wrappedInstance)' in code
+    assert 'TPbool(TPVector2D._py__eq__(lhs.wrappedInstance, rhs.wrappedInstance))' in code
+
+
+def test_generic_classes_share_cached_handles():
+    stub = Path(__file__).parent.parent.parent / 'stubs' / 'builtins.stub.py'
+    classes = {x.object_name: x for x in create_static_module_orm('builtins.stub', str(stub)).classes}
+    code = classes['List'].render()
+    assert 'fileprivate enum _TPListHandles {\n    static let wrappedClass = Python.import("builtins").list\n' in code
+    assert 'static var wrappedClass: PythonObject { _TPListHandles.wrappedClass }' in code
+    assert 'let val = _TPListHandles._py_append(wrappedInstance, obj.wrappedInstance)' in code
+    assert 'dynamicMember: "append"](' not in code
+    assert 'static let wrappedClass = Python.import("builtins").int' in classes['int'].render()
+
+
+def test_instrumentation():
+    samples = Path(__file__).parent.parent.parent / 'samples'
+    module = create_module_orm(load_module_from_path('mathy', str(samples / 'mathy.py')))
+    assert 'TPythonMetrics' not in module.render()
+    assert 'TPythonMetrics' not in _render('typed_python.swift.j2', {'modules': []})
+    set_instrumentation(True)
+    try:
+        code = module.render()
+        typed_python = _render('typed_python.swift.j2', {'modules': []})
+    finally:
+        set_instrumentation(False)
+    assert 'let val = TPythonMetrics.measure("mathy.Vector2D.magnitude", { TPVector2D._py_magnitude(wrappedInstance) })' in code
+    assert 'var x: TPfloat { return TPythonMetrics.measure("mathy.Vector2D.x", { TPfloat(wrappedInstance[dynamicMember: "x"]) }) }' in code
+    assert 'TPythonMetrics.measure("mathy.Vector2D.__init__", { TPVector2D.wrappedClass(x.wrappedInstance, y.wrappedInstance) })' in code
+    assert 'TPbool(TPythonMetrics.measure("mathy.Vector2D.__eq__", { TPVector2D._py__eq__(lhs.wrappedInstance, rhs.wrappedInstance) }))!' in code
+    assert 'public enum TPythonMetrics {' in typed_python
+    assert typed_python.startswith('import Foundation\n')
@@ -0,0 +1,62 @@
+from pathlib import Path
+
+import pytest
+
+from samples import basic, basic_module, batch_module, complex, mathy
+from swift_python_wrapper.core import create_module_orm, load_module_from_path
+from swift_python_wrapper.static_extraction import create_static_module_orm, mirror_module, MirroredFunctionCallError
+
+ROOT = Path(__file__).parent.parent.parent
+
+
+@pytest.mark.parametrize('module', [basic, basic_module, batch_module, complex, mathy])
+def test_samples_parity(module):
+    static_module = create_static_module_orm(module.__name__, module.__file__)
+    assert static_module.render() == create_module_orm(module).render()
+
+
+def test_builtins_stub_parity():
+    path = str(ROOT / 'stubs' / 'builtins.stub.py')
+    imported_module = create_module_orm(load_module_from_path('builtins.stub', path))
+    assert create_static_module_orm('builtins.stub', path).render() == imported_module.render()
+
+
+def test_orm_parity():
+    assert create_static_module_orm(basic_module.__name__, basic_module.__file__) == create_module_orm(basic_module)
+
+
+def test_module_is_not_executed(tmpdir):
+    path = tmpdir / 'side_effects.pyi'
+    path.write('import not_installed_package\n'
+               'from typing import Optional\n'
+               'raise RuntimeError("executed")\n'
+               'class A:\n'
+               '    def f(self, x: not_installed_package.Thing) -> Optional[int]: ...\n')
+    module = create_static_module_orm('side_effects', str(path))
+    method = module.classes[0].methods[0]
+    assert method.args[0].mapped_type == 'TPThing'
+    assert method.mapped_return_type == 'TPint?'
+
+
+def test_imported_buffer_types_are_mapped_by_qualified_name():
+    module = mirror_module('buffers', 'import numpy as np\nfrom array import array\n\ndef f(x: array) -> np.ndarray: ...\n')
+    function = create_module_orm(module).functions[0]
+    assert function.args[0].mapped_type == 'TPBuffer'
+    assert function.wrapped_return == 'TPBuffer(val)'
+
+
+def test_unresolved_slots_are_ignored():
+    module = mirror_module('slots', 'class A:\n'
+                                   '    __slots__ = ("x",)\n'
+                                   'class B:\n'
+                                   '    __slots__ = A.__slots__ + ("y",)\n'
+                                   '    def f(self) -> int: ...\n')
+    assert module.A.__slots__ == ('x',)
+    assert not hasattr(module.B, '__slots__')
+    assert [x.name for x in create_module_orm(module).classes[1].methods] == ['f']
+
+
+def test_mirrored_functions_cant_be_called():
+    module = mirror_module('mirrored', 'def f(x: int) -> int:\n    return x\n')
+    with pytest.raises(MirroredFunctionCallError, match='f was extracted statically'):
+        module.f(1)
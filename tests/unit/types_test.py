@@ -1,6 +1,10 @@
-from typing import Tuple
+from array import array
+from fractions import Fraction
+from typing import Tuple, Optional, List
 
 from swift_python_wrapper.rendering import Function
+from swift_python_wrapper.type_mapping import convert_to_swift_type, register_swift_type, type_mapping_cache_info, \
+    _types, _convert_cached, set_numeric_list_mappings
 
 
 def test_wrapped_return():
@@ -9,4 +13,50 @@ def test_wrapped_return():
         args=[],
         cls='A',
         return_type=Tuple[int, float]
-    ).wrapped_return == '(TPint(val.0), TPfloat(val.1))'
\ No newline at end of file
+    ).wrapped_return == '{ (TPint($0.0), TPfloat($0.1)) }(val.tuple2)'
+
+
+def test_convert_to_swift_type():
+    assert convert_to_swift_type(Optional[int]) == 'TPint?'
+    assert convert_to_swift_type(List['str']) == 'TPList<TPstr>'
+    assert convert_to_swift_type(Tuple[int, 'str']) == '(TPint, TPstr)'
+    assert convert_to_swift_type('Dict[T, V]') == 'TPDict<T, V>'
+
+
+def test_registered_swift_types():
+    register_swift_type('fractions.Fraction', 'PythonObject')
+    try:
+        assert convert_to_swift_type(Fraction) == 'PythonObject'
+        assert convert_to_swift_type(Optional[Fraction]) == 'PythonObject?'
+    finally:
+        del _types['fractions.Fraction']
+        _convert_cached.cache_clear()
+
+
+def test_buffer_types():
+    ndarray = type('ndarray', (), {'__module__': 'numpy'})
+    assert convert_to_swift_type(array) == 'TPBuffer'
+    assert convert_to_swift_type(memoryview) == 'TPBuffer'
+    assert convert_to_swift_type(Optional[ndarray]) == 'TPBuffer?'
+    assert Function(name='f', args=[], cls='A', return_type=array).wrapped_return == 'TPBuffer(val)'
+
+
+def test_numeric_list_mappings():
+    assert convert_to_swift_type(List[float]) == 'TPList<TPfloat>'
+    set_numeric_list_mappings(True)
+    try:
+        assert convert_to_swift_type(List[float]) == '[Double]'
+        assert convert_to_swift_type(Optional[List[int]]) == '[Int]?'
+        assert Function(name='f', args=[], cls='A', return_type=List[float]).wrapped_return == '[Double](pythonBuffer: val)'
+        assert convert_to_swift_type(List[List[float]]) == 'TPList<TPList<TPfloat>>'
+        assert Function(name='g', args=[], cls='A', return_type=List[List[int]]).wrapped_return == 'TPList<TPList<TPint>>(val)'
+    finally:
+        set_numeric_list_mappings(False)
+    assert convert_to_swift_type(List[int]) == 'TPList<TPint>'
+
+
+def test_conversion_cache():
+    convert_to_swift_type(Optional[float])
+    hits = type_mapping_cache_info().hits
+    convert_to_swift_type(Optional[float])
+    assert type_mapping_cache_info().hits == hits + 1
@@ -0,0 +1,109 @@
+import json
+import socket
+from pathlib import Path
+from shutil import copy
+
+from swift_python_wrapper.module_index import build_module_index
+from swift_python_wrapper.type_mapping import _convert_cached
+from swift_python_wrapper.watch import Watcher, serve_in_background
+
+SAMPLES = Path(__file__).parent.parent.parent / 'samples'
+
+
+def _watcher(tmpdir, *samples):
+    source_dir, target_dir = Path(str(tmpdir.mkdir('src'))), Path(str(tmpdir.mkdir('out')))
+    for sample in samples:
+        copy(str(SAMPLES / sample), str(source_dir))
+    return source_dir, target_dir, Watcher(None, str(source_dir), str(target_dir))
+
+
+def test_regenerates_only_changed_modules(tmpdir):
+    source_dir, target_dir, watcher = _watcher(tmpdir, 'mathy.py', 'basic_module.py')
+    update = watcher.update()
+    assert sorted(update.regenerated) == ['basic_module', 'mathy'] and update.removed == [] and update.errors == {}
+    assert (target_dir / 'TPythonModule_mathy.swift').exists()
+    assert (target_dir / 'typed_python.swift').exists()
+    assert watcher.update().regenerated == []
+
+    mathy = source_dir / 'mathy.py'
+    mathy.write_text(mathy.read_text() + '\n\ndef halve(x: float) -> float:\n    return x / 2\n')
+    update = watcher.update()
+    assert update.regenerated == ['mathy']
+    assert 'halve' in (target_dir / 'TPythonModule_mathy.swift').read_text()
+    assert watcher.status()['modules']['mathy']['functions'] == len(watcher.modules['mathy'].functions)
+
+
+def test_caches_dont_grow_with_edits(tmpdir):
+    source_dir, _, watcher = _watcher(tmpdir)
+    shapes = source_dir / 'shapes.py'
+    shapes.write_text('class Shape:\n    def area(self) -> float: ...\n\n\ndef unit() -> Shape: ...\n')
+    sizes = []
+    for edit in range(3):
+        shapes.write_text(shapes.read_text() + f'\n\ndef edit{edit}(x: float) -> Shape: ...\n')
+        assert watcher.update().regenerated == ['shapes']
+        sizes.append((_convert_cached.cache_info().currsize, build_module_index.cache_info().currsize))
+    assert sizes[0] == sizes[1] == sizes[2]
+
+
+def test_touched_but_unchanged_source_is_not_regenerated(tmpdir):
+    source_dir, _, watcher = _watcher(tmpdir, 'mathy.py')
+    watcher.update()
+    mathy = source_dir / 'mathy.py'
+    mathy.write_text(mathy.read_text())
+    assert watcher.update().regenerated == []
+
+
+def test_errors_and_removed_modules(tmpdir):
+    source_dir, target_dir, watcher = _watcher(tmpdir, 'mathy.py', 'basic_module.py')
+    watcher.update()
+    mathy = source_dir / 'mathy.py'
+    source = mathy.read_text()
+    mathy.write_text(source + '\ndef broken(:\n')
+    update = watcher.update()
+    assert update.regenerated == [] and list(update.errors) == ['mathy']
+    assert 'mathy.py' in watcher.status()['errors']['mathy']
+    assert watcher.update().errors == {}  # Only reported when the source changes
+
+    mathy.write_text(source)
+    assert watcher.update().regenerated == ['mathy']
+    assert watcher.status()['errors'] == {}
+
+    (source_dir / 'basic_module.py').unlink()
+    update = watcher.update()
+    assert update.removed == ['basic_module']
+    assert set(watcher.status()['modules']) == {'mathy'}
+    assert 'basic_module' not in (target_dir / 'typed_python.swift').read_text()
+
+
+def test_source_removed_after_listing(tmpdir, monkeypatch):
+    source_dir, _, watcher = _watcher(tmpdir, 'mathy.py', 'basic_module.py')
+    listed = [('basic_module', str(source_dir / 'basic_module.py')), ('mathy', str(source_dir / 'mathy.py'))]
+    (source_dir / 'mathy.py').unlink()
+    monkeypatch.setattr('swift_python_wrapper.watch.get_module_sources', lambda *args, **kwargs: iter(listed))
+    update = watcher.update()
+    assert update.regenerated == ['basic_module'] and update.errors == {}
+
+    monkeypatch.undo()
+    assert watcher.update().removed == []  # It was never generated
+    copy(str(SAMPLES / 'mathy.py'), str(source_dir))
+    assert watcher.update().regenerated == ['mathy']
+
+
+def test_socket_server(tmpdir):
+    _, _, watcher = _watcher(tmpdir, 'mathy.py')
+    socket_path = str(tmpdir / 'swrap.sock')
+    server = serve_in_background(socket_path, watcher)
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(socket_path)
+            responses = client.makefile('rb')
+            for request in [{'command': 'regenerate'}, {'command': 'status'}, {'command': 'compile'}]:
+                client.sendall(json.dumps(request).encode() + b'\n')
+            regenerated, status, unknown = [json.loads(responses.readline().decode()) for _ in range(3)]
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert regenerated['regenerated'] == ['mathy']
+    assert status['modules']['mathy']['classes'] == 1
+    assert 'error' in unknown
+    assert not Path(socket_path).exists()